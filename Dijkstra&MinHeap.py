@@ -4,69 +4,951 @@
 # Dijkstra implemented within the escape function and the MinHeap implementation could be found at the last section of the code
 
 
+import asyncio
+import heapq
+import importlib.util
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from time import perf_counter
+from types import SimpleNamespace
+
+#NumPy is only needed by TreeMap.escape_vectorized()
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _number_array(values):
+    """
+    Stores numbers in a compact array, as 64-bit integers when every value is integral and as
+    doubles otherwise
+
+    Input:
+        values: list or array of numbers
+    Return:
+        An array.array with typecode 'q' or 'd'
+
+    Time complexity: O(n), where n is the number of values
+    Space complexity: O(n), where n is the number of values
+    """
+    try:
+        return array('q', values)
+    except TypeError:
+        return array('d', values)
+
+
+def _typecode(values):
+    """
+    Typecode of an array.array, or format of a memoryview standing in for one
+    Complexity(Space and time): O(1)
+    """
+    if isinstance(values, array):
+        return values.typecode
+    return values.format
+
+
+def _build_csr(n, heads, tails, weights):
+    """
+    Builds a compressed sparse row (CSR) layout of the roads heads[e] -> tails[e] with weights[e]
+    using a counting sort on the head of each road. The roads of Tree u end up in
+    targets[offsets[u]:offsets[u+1]] and weights[offsets[u]:offsets[u+1]], in input order.
+
+    Precondition: heads, tails and weights have the same length and 0 <= heads[e] < n
+    Postcondition: offsets has n+1 entries, targets and weights have one entry per road
+
+    Input:
+        n: number of Trees
+        heads: array of Tree ids each road starts from
+        tails: array of Tree ids each road ends at
+        weights: array of road weights
+    Return:
+        (offsets, targets, weights) arrays
+
+    Time complexity:
+        Best & Worst case: O(T+R), one counting pass, one prefix sum and one placement pass
+    Space complexity:
+        Input space: O(R), where R is the number of roads
+        Aux space: O(T+R), where T & R are the number of Trees and Roads
+    """
+    offsets = array('q', bytes(8 * (n + 1)))
+    for u in heads:
+        offsets[u + 1] += 1
+    for u in range(n):
+        offsets[u + 1] += offsets[u]
+
+    # fill[u] is the next free slot of Tree u
+    fill = array('q', offsets)
+    targets = array('q', bytes(8 * len(heads)))
+    sorted_weights = array(weights.typecode, bytes(weights.itemsize * len(heads)))
+    for e in range(len(heads)):
+        u = heads[e]
+        slot = fill[u]
+        targets[slot] = tails[e]
+        sorted_weights[slot] = weights[e]
+        fill[u] = slot + 1
+    return offsets, targets, sorted_weights
+
+
+def _csr_insert(offsets, targets, weights, free, u, v, w):
+    """
+    Adds the road u -> v with weight w to a CSR layout. A free slot of Tree u is reused if there is one,
+    otherwise room for D//2+1 roads is opened after the roads of u (D being its number of slots) and the
+    slots not used now are kept free for the next roads of u.
+    A free slot holds a road from u to itself of weight 0, which never gives a shorter time to any search.
+
+    Input:
+        offsets, targets, weights: arrays of the CSR layout, changed in place
+        free: dictionary of Tree id -> list of its free slots, counted from the first slot of the Tree
+        u, v, w: the road
+    Time complexity: O(1) with a free slot, O(T+R) when room is opened (amortized over the slots opened)
+    Space complexity: O(T+D), where D is the number of slots of Tree u
+    """
+    slots = free.setdefault(u, [])
+    if len(slots) == 0:
+        first, end = offsets[u], offsets[u + 1]
+        room = (end - first) // 2 + 1
+        targets[end:end] = array('q', [u]) * room
+        weights[end:end] = array(weights.typecode, [0]) * room
+        offsets[u + 1:] = array('q', [offset + room for offset in offsets[u + 1:]])
+        #Lowest slot last, so that it is used first
+        slots.extend(reversed(range(end - first, end - first + room)))
+    slot = offsets[u] + slots.pop()
+    targets[slot] = v
+    weights[slot] = w
+
+
+def _csr_remove(offsets, targets, weights, free, u, v):
+    """
+    Removes every road u -> v from a CSR layout by turning its slot into a free slot (see _csr_insert())
+
+    Input:
+        offsets, targets, weights: arrays of the CSR layout, changed in place
+        free: dictionary of Tree id -> list of its free slots, counted from the first slot of the Tree
+        u, v: the road
+    Return: the number of roads removed
+    Time complexity: O(D), where D is the number of slots of Tree u
+    Space complexity: O(D), where D is the number of slots of Tree u
+    """
+    first = offsets[u]
+    slots = free.setdefault(u, [])
+    unused = set(slots)
+    removed = 0
+    for e in range(first, offsets[u + 1]):
+        if targets[e] == v and e - first not in unused:
+            targets[e] = u
+            weights[e] = 0
+            slots.append(e - first)
+            removed += 1
+    return removed
+
+
+def _csr_set(offsets, targets, weights, free, u, v, w):
+    """
+    Sets the weight of every road u -> v of a CSR layout to w
+
+    Input:
+        offsets, targets, weights: arrays of the CSR layout, changed in place
+        free: dictionary of Tree id -> list of its free slots, counted from the first slot of the Tree
+        u, v: the road
+        w: the new weight
+    Return: the smallest weight the roads had before, None if there is no road u -> v
+    Time complexity: O(D), where D is the number of slots of Tree u
+    Space complexity: O(D), where D is the number of slots of Tree u
+    """
+    first = offsets[u]
+    unused = set(free.get(u, ()))
+    old = None
+    for e in range(first, offsets[u + 1]):
+        if targets[e] == v and e - first not in unused:
+            if old is None or weights[e] < old:
+                old = weights[e]
+            weights[e] = w
+    return old
+
+
+def _csr_compact(offsets, targets, weights, free):
+    """
+    Copies a CSR layout without its free slots (see _csr_insert())
+
+    Input:
+        offsets, targets, weights: arrays of the CSR layout
+        free: dictionary of Tree id -> list of its free slots, counted from the first slot of the Tree
+    Return: (offsets, targets, weights) of the copy, with no free slot
+    Time complexity: O(T+R)
+    Space complexity: O(T+R)
+    """
+    new_offsets = array('q', [0])
+    new_targets = array('q')
+    new_weights = array(_typecode(weights))
+    for u in range(len(offsets) - 1):
+        first = offsets[u]
+        unused = set(free.get(u, ()))
+        for e in range(first, offsets[u + 1]):
+            if e - first not in unused:
+                new_targets.append(targets[e])
+                new_weights.append(weights[e])
+        new_offsets.append(len(new_targets))
+    return new_offsets, new_targets, new_weights
+
+
+#Arrays which hold a TreeMap, in the order they are laid out in a buffer (see TreeMap.array_layout())
+TREEMAP_ARRAYS = ('offsets', 'targets', 'weights', 'reverse_offsets', 'reverse_targets', 'reverse_weights',
+                  'solulu_ids', 'claw_times', 'teleport_to')
+
+#Memory budget of the arrays of a TreeMap in bytes (see TreeMap.nbytes() and TreeMap.memory_budget()):
+#an offset per Tree and a target and a weight per Road, in both directions, and an id, a claw_time and a
+#teleport_to per solulu. A free slot left by a removed road takes half a Road, one direction.
+BYTES_PER_TREE = 16
+BYTES_PER_ROAD = 32
+BYTES_PER_SOLULU = 24
+#Memory of one escape() per Tree, on 64-bit CPython: the forward and backward SearchSpaces with their
+#binary MinHeaps, and the time object and touched entry of every Tree they discover
+BYTES_PER_QUERY_TREE = 256
+#Size of a Tree view (without its list of Roads) and of a Road view, on 64-bit CPython
+TREE_VIEW_BYTES = 72
+ROAD_VIEW_BYTES = 56
+
+#Snapshot file format of TreeMap.save() and TreeMap.open()
+_SNAPSHOT_MAGIC = b'TREEMAP\0'
+_SNAPSHOT_VERSION = 1
+#magic, version, byte order, weights typecode, max_weight in the weights typecode (24 bytes)
+_SNAPSHOT_HEADER = struct.Struct('<8sIcc2x8s')
+#typecode and length of one array (16 bytes, keeps the arrays 8-byte aligned)
+_SNAPSHOT_ARRAY = struct.Struct('<c7xq')
+
+
 class TreeMap:
     """
     Class which represents a Forest, containing Trees.
     Each Tree may contain Roads.
+
+    The roads are stored in compressed sparse row (CSR) form: the roads leaving Tree u are
+    targets[offsets[u]:offsets[u+1]] with weights[offsets[u]:offsets[u+1]].
+    Tree and Road objects are only built on demand as views (see tree() and adjacency_list).
     """
 
+    #Largest number of searches escape_many() keeps cached
+    cache_size = 32
+
+    #Function called with the EscapeStats of every escape(), None to not instrument escape()
+    on_escape = None
+
     def __init__(self, roads, solulus):
         """
         This initiliazes a TreeMap object
 
         Precondition: roads and solulus are lists of tuples
-        Postcondition: self.adjacency_list contains all of the Trees and Roads based on roads & solulus input
+        Postcondition: self.offsets, self.targets and self.weights hold all of the Roads, the reverse_
+                       arrays hold all of the Roads reversed, and self.solulu_ids, self.claw_times and
+                       self.teleport_to hold all of the solulus
 
         Input:
-            roads: List of Road objects
-            solulus: List of tuples representing solulu trees
+            roads: List of (u, v, w) tuples representing Roads
+            solulus: List of (id, claw_time, teleport_to) tuples representing solulu trees
         Return:
             None
 
         Time complexity: 
-            Best case analysis: O(T+R), for each Road in roads we iterate through all Trees in adjacency_list 
-            Worst case analysis: O(T+R), for each Road in roads we iterate through all Trees in adjacency_list 
+            Best case analysis: O(T+R), the roads are placed with a counting sort on their origin Tree
+            Worst case analysis: O(T+R), the roads are placed with a counting sort on their origin Tree
         Space complexity: 
-            Input space analysis: O(T), where T are the number of trees in the adjacency_list
-            Aux space analysis: O(T), where T are the number of trees in the adjacency_list
+            Input space analysis: O(R+S), where R are the number of roads and S the number of solulus
+            Aux space analysis: O(T+R), where T & R are the number of Trees and Roads
+        """
+        heads = array('q', (road[0] for road in roads))
+        tails = array('q', (road[1] for road in roads))
+        weights = _number_array([road[2] for road in roads])
+        self._build(heads, tails, weights, solulus)
+
+    def _build(self, heads, tails, weights, solulus):
         """
+        Lays out the roads given as three parallel arrays, and the solulus, into the arrays of this TreeMap
 
+        Input:
+            heads, tails, weights: arrays holding the u, v and w of every Road
+            solulus: iterable of (id, claw_time, teleport_to) tuples representing solulu trees
+        Time complexity: O(T+R+S), the roads are placed with a counting sort on their origin Tree
+        Space complexity: O(T+R+S)
+        """
         #Finding the maximum number of trees by finding the highest Tree.id among all roads
-        max = 0
-        for i in range(len(roads)):
-            if roads[i][0] > max:
-                max = roads[i][0]
-            if roads[i][1] > max:
-                max = roads[i][1]
-        #Storing so that it could be accessed
-        self.max = max
-        
-        #Creating our adjacency_list with max+1 spaces
-        self.adjacency_list = [None] * (max+1)
+        self.max = 0
+        if len(heads) > 0:
+            self.max = max(max(heads), max(tails))
+        n = self.max + 1
+
+        #Laying out the roads of every Tree contiguously, and the reversed roads for the searches from the exits
+        self.offsets, self.targets, self.weights = _build_csr(n, heads, tails, weights)
+        self.reverse_offsets, self.reverse_targets, self.reverse_weights = _build_csr(n, tails, heads, weights)
+
+        # A solulu listed twice keeps its last claw_time and teleport_to
+        solulu_map = {}
+        for solulu in solulus:
+            solulu_map[solulu[0]] = (solulu[1], solulu[2])
+        self.solulu_ids = array('q', solulu_map.keys())
+        self.claw_times = _number_array([value[0] for value in solulu_map.values()])
+        self.teleport_to = array('q', (value[1] for value in solulu_map.values()))
+
+        self._prepare()
+
+    @classmethod
+    def from_edge_file(cls, path, solulus, binary=False, weight_typecode='q', chunk_size=1 << 20):
+        """
+        Builds a TreeMap from an edge-list file, read in chunks straight into the road arrays, so no tuple or
+        Road object is created per road.
 
-        for i in range(max+1):  #Creating a tree for each slot in adjacency_list
-            if self.adjacency_list[i] == None:
-                self.adjacency_list[i] = Tree(i)
-        
-        #Creating and adding roads to its respective Trees
-        for i in range(len(roads)):    
-            for j in range(len(self.adjacency_list)):
-                if self.adjacency_list[j].id == roads[i][0]:
-                    self.adjacency_list[j].add_road(Road(roads[i][0], roads[i][1], roads[i][2]))
-                    
-        # For each Tree object in seld.adjacency list that is a solulu
-        # Set the solulu attributes belonging to the tree
-        for i in range(len(solulus)):
-            self.adjacency_list[solulus[i][0]].solulu = True
-            self.adjacency_list[solulus[i][0]].claw_time = solulus[i][1]
-            self.adjacency_list[solulus[i][0]].teleport_to = solulus[i][2]
-        
-        
+        A text file holds one road per line as "u v w" (whitespace separated). The weights are read as integers,
+        switching to floats as soon as one is not an integer.
+        A binary file holds every road as three native-endian 8-byte numbers u, v, w: the ids are 64-bit
+        integers and w has weight_typecode ('q' for 64-bit integers, 'd' for doubles).
 
-           
-   
-    
-    def escape(self, start, exits):
+        Precondition: path is a readable edge-list file in the given format
+        Postcondition: The TreeMap holds every road of the file
+
+        Input:
+            path: path of the edge-list file
+            solulus: List of (id, claw_time, teleport_to) tuples representing solulu trees
+            binary: True for the binary format, False for the text format
+            weight_typecode: typecode of the weights in the binary format
+            chunk_size: number of bytes read at a time
+        Return:
+            A TreeMap
+
+        Time complexity: O(T+R+S)
+        Space complexity: O(T+R+S+chunk_size), the road arrays and one chunk of the file
+        """
+        heads, tails = array('q'), array('q')
+        weights = array(weight_typecode if binary else 'q')
+        with open(path, 'rb') as file:
+            if binary:
+                #Reading whole records only
+                chunk_size = max(24, chunk_size - chunk_size % 24)
+                data = file.read(chunk_size)
+                while len(data) > 0:
+                    if len(data) % 24 != 0:
+                        raise ValueError("Truncated road record in " + str(path))
+                    ids = memoryview(data).cast('q')
+                    heads.extend(ids[0::3])
+                    tails.extend(ids[1::3])
+                    weights.extend(memoryview(data).cast(weight_typecode)[2::3])
+                    data = file.read(chunk_size)
+            else:
+                rest = b''
+                while True:
+                    data = file.read(chunk_size)
+                    if len(data) > 0:
+                        #Only the complete lines are parsed, the last partial line waits for the next chunk
+                        data = rest + data
+                        cut = data.rfind(b'\n') + 1
+                        rest = data[cut:]
+                        tokens = data[:cut].split()
+                    else:
+                        tokens = rest.split()
+                    if len(tokens) % 3 != 0:
+                        raise ValueError("Every road needs u, v and w in " + str(path))
+                    try:
+                        chunk_weights = array(weights.typecode, map(int, tokens[2::3]))
+                    except ValueError:
+                        weights = array('d', weights)
+                        chunk_weights = array('d', map(float, tokens[2::3]))
+                    heads.extend(map(int, tokens[0::3]))
+                    tails.extend(map(int, tokens[1::3]))
+                    weights.extend(chunk_weights)
+                    if len(data) == 0:
+                        break
+
+        tree_map = cls.__new__(cls)
+        tree_map._build(heads, tails, weights, solulus)
+        return tree_map
+
+    @classmethod
+    def from_arrays(cls, arrays, max_weight=None):
+        """
+        Builds a TreeMap directly on existing arrays, without copying them. The arrays may be array.array objects
+        or memoryviews (for example over shared memory or a memory-mapped file).
+
+        Precondition: arrays hold a valid TreeMap, as laid out by a TreeMap built with __init__
+        Postcondition: the TreeMap reads its Roads and solulus from the given arrays
+
+        Input:
+            arrays: dictionary with an entry for every name in TREEMAP_ARRAYS
+            max_weight: largest road weight, found by scanning the weights if None
+        Return:
+            A TreeMap
+
+        Time complexity: O(S), or O(S+R) if max_weight is None
+        Space complexity: O(S), where S is the number of solulus
+        """
+        tree_map = cls.__new__(cls)
+        for name in TREEMAP_ARRAYS:
+            setattr(tree_map, name, arrays[name])
+        tree_map.max = len(tree_map.offsets) - 2
+        tree_map._prepare(max_weight)
+        return tree_map
+
+    def _prepare(self, max_weight=None):
+        """
+        Sets up what a TreeMap derives from its arrays: the largest weight, the goals of the searches,
+        the SearchSpace pools and the escape_many() cache
+
+        Input:
+            max_weight: largest road weight, found by scanning the weights if None
+        Time complexity: O(S), or O(S+R) if max_weight is None
+        Space complexity: O(S), where S is the number of solulus
+        """
+        #Largest road weight, bounds the number of buckets of a BucketQueue
+        if max_weight is None:
+            max_weight = max(self.weights, default=0)
+        self.max_weight = max_weight
+
+        #Goals of the searches from the start and from the exits, and the index of every solulu
+        self._index_solulus()
+
+        #Pools of SearchSpaces holding the per query state of escape(), by (heap backend, size)
+        self._spaces = {}
+        #Finished searches of escape_many(), by ('start', start) or ('exits', frozenset of exits)
+        self._cache = OrderedDict()
+
+        #Number of changes of the roads and solulus, so that what is built on them can tell it is out of date
+        self.changes = 0
+
+        #Free slots left by removed roads, by Tree id (see _csr_insert())
+        self._free = {}
+        self._reverse_free = {}
+        #((start, frozenset of exits), forward, backward) of the last dynamic escape(), repaired on every change
+        self._dynamic = None
+
+        #NumPy copies of the roads and reversed roads for escape_vectorized(), made on first use
+        self._vectors = None
+
+        #Landmark Trees and their distances (see preprocess_landmarks()), None until preprocessed
+        self.landmarks = None
+        self._landmark_from = None
+        self._landmark_to = None
+
+    def compacted(self):
+        """
+        This TreeMap without the free slots left by removed roads and by room opened for new roads, which are
+        kept as roads from a Tree to itself of weight 0 (see _csr_insert()). The slots are only known to this
+        TreeMap, so they are dropped before its arrays are written for another TreeMap to read.
+
+        Return:
+            self if there are no free slots, a new TreeMap holding copies of the arrays otherwise
+        Time complexity: O(1) without free slots, O(T+R+S) otherwise
+        Space complexity: O(1) without free slots, O(T+R+S) otherwise
+        """
+        if not any(self._free.values()) and not any(self._reverse_free.values()):
+            return self
+        arrays = {name: getattr(self, name) for name in TREEMAP_ARRAYS}
+        arrays['offsets'], arrays['targets'], arrays['weights'] = _csr_compact(
+            self.offsets, self.targets, self.weights, self._free)
+        arrays['reverse_offsets'], arrays['reverse_targets'], arrays['reverse_weights'] = _csr_compact(
+            self.reverse_offsets, self.reverse_targets, self.reverse_weights, self._reverse_free)
+        return type(self).from_arrays(arrays, self.max_weight)
+
+    def array_layout(self):
+        """
+        Places every array of this TreeMap one after the other in a single buffer, in TREEMAP_ARRAYS order.
+        Every item takes 8 bytes, so every array stays 8-byte aligned.
+
+        Return:
+            (layout, size): layout is a list of (name, typecode, byte offset, length) and size the
+                            number of bytes of the buffer
+        Time complexity: O(1)
+        Space complexity: O(1)
+        """
+        layout = []
+        position = 0
+        for name in TREEMAP_ARRAYS:
+            values = getattr(self, name)
+            layout.append((name, _typecode(values), position, len(values)))
+            position += 8 * len(values)
+        return layout, position
+
+    def write_arrays(self, buffer, layout, start=0):
+        """
+        Copies every array of this TreeMap into buffer at the positions given by layout
+
+        Input:
+            buffer: writable buffer of at least start + size bytes (see array_layout())
+            layout: layout returned by array_layout()
+            start: byte position of the layout in buffer
+        Time complexity: O(T+R+S)
+        Space complexity: O(1)
+        """
+        view = memoryview(buffer)
+        for name, typecode, offset, length in layout:
+            view[start + offset:start + offset + 8 * length] = memoryview(getattr(self, name)).cast('B')
+
+    @classmethod
+    def from_buffer(cls, buffer, layout, start=0, max_weight=None):
+        """
+        Builds a TreeMap on a buffer written by write_arrays(), without copying it (see from_arrays())
+
+        Input:
+            buffer: buffer holding the arrays
+            layout: layout returned by array_layout()
+            start: byte position of the layout in buffer
+            max_weight: largest road weight, found by scanning the weights if None
+        Return:
+            A TreeMap
+        Time complexity: O(S), or O(S+R) if max_weight is None
+        Space complexity: O(S), where S is the number of solulus
+        """
+        view = memoryview(buffer)
+        arrays = {}
+        for name, typecode, offset, length in layout:
+            arrays[name] = view[start + offset:start + offset + 8 * length].cast(typecode)
+        return cls.from_arrays(arrays, max_weight)
+
+    def save(self, path):
+        """
+        Writes this TreeMap to a binary snapshot file which TreeMap.open() maps back into memory without copying.
+        The file is written to a new temporary file next to path and renamed over it, so a reader never sees a
+        partial snapshot and processes saving at the same time do not write to the same file. The temporary file
+        is removed if writing fails. The snapshot gets the permissions of any new file (0o666 less the umask),
+        so that processes of other users can open it too.
+
+        Free slots are not written (see compacted()), so the snapshot only holds the roads of this TreeMap.
+
+        Layout (header fields little-endian, arrays in the byte order of this machine):
+            header: magic b"TREEMAP\\0", version, byte order (b"l"/b"b"), weights typecode, max_weight (8 bytes)
+            one (typecode, length) entry per array in TREEMAP_ARRAYS
+            the arrays themselves, one after the other, 8 bytes per item (see array_layout())
+
+        Input:
+            path: path of the snapshot file
+        Time complexity: O(T+R+S)
+        Space complexity: O(1), the arrays are written directly from memory, O(T+R+S) if there are free slots
+        """
+        tree_map = self.compacted()
+        layout, size = tree_map.array_layout()
+        typecode = _typecode(tree_map.weights).encode()
+        path = os.path.abspath(path)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.',
+                                                 suffix='.tmp')
+        #mkstemp() creates the file for its owner only, reading the umask means setting it for a moment
+        umask = os.umask(0)
+        os.umask(umask)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                if hasattr(os, 'fchmod'):
+                    os.fchmod(file.fileno(), 0o666 & ~umask)
+                file.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, sys.byteorder[0].encode(),
+                                                 typecode, struct.pack('=' + typecode.decode(), tree_map.max_weight)))
+                for name, array_typecode, offset, length in layout:
+                    file.write(_SNAPSHOT_ARRAY.pack(array_typecode.encode(), length))
+                for name, array_typecode, offset, length in layout:
+                    file.write(memoryview(getattr(tree_map, name)).cast('B'))
+            os.replace(temporary, path)
+        finally:
+            #Only left when writing or renaming failed
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Opens a snapshot written by save(). The file is memory-mapped read-only and the TreeMap reads its arrays
+        straight from the mapping, so opening does not depend on the size of the forest and processes opening
+        the same file share one copy in the page cache.
+
+        Precondition: path is a snapshot of a compatible version written on a machine with the same byte order
+        Postcondition: The TreeMap reads its Roads and solulus from the mapped file
+        A file which is not such a snapshot, or whose size does not match its table of arrays (cut off or with
+        bytes appended), raises ValueError.
+
+        Input:
+            path: path of the snapshot file
+        Return:
+            A TreeMap
+
+        Time complexity: O(S), where S is the number of solulus
+        Space complexity: O(S), the file itself is only mapped
+        """
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < _SNAPSHOT_HEADER.size + len(TREEMAP_ARRAYS) * _SNAPSHOT_ARRAY.size:
+                raise ValueError(str(path) + " is not a TreeMap snapshot")
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, byteorder, typecode, max_weight = _SNAPSHOT_HEADER.unpack_from(mapping, 0)
+            if magic != _SNAPSHOT_MAGIC:
+                raise ValueError(str(path) + " is not a TreeMap snapshot")
+            if version != _SNAPSHOT_VERSION:
+                raise ValueError("Unsupported TreeMap snapshot version " + str(version))
+            if byteorder != sys.byteorder[0].encode():
+                raise ValueError("TreeMap snapshot was written with a different byte order")
+            if typecode not in (b'q', b'd'):
+                raise ValueError("Unsupported weight typecode in TreeMap snapshot")
+
+            #Rebuilding the layout of array_layout() from the (typecode, length) entries
+            layout = []
+            position = _SNAPSHOT_HEADER.size
+            offset = 0
+            for name in TREEMAP_ARRAYS:
+                array_typecode, length = _SNAPSHOT_ARRAY.unpack_from(mapping, position)
+                if array_typecode not in (b'q', b'd') or length < 0:
+                    raise ValueError("Corrupt array table in TreeMap snapshot " + str(path))
+                position += _SNAPSHOT_ARRAY.size
+                layout.append((name, array_typecode.decode(), offset, length))
+                offset += 8 * length
+            #Slicing the mapping would silently cut arrays short, so the table has to match the file exactly
+            if position + offset != len(mapping):
+                raise ValueError("TreeMap snapshot {} holds {} bytes, its table needs {}".format(
+                    path, len(mapping), position + offset))
+        except BaseException:
+            mapping.close()
+            raise
+
+        tree_map = cls.from_buffer(mapping, layout, position, struct.unpack('=' + typecode.decode(), max_weight)[0])
+        #Keeping the mapping open for as long as the TreeMap lives
+        tree_map._mapping = mapping
+        return tree_map
+
+    def tree(self, id):
+        """
+        Builds a Tree view (with its Road objects and solulu attributes) of the Tree with the given id.
+        The view is a copy: changing it does not change the TreeMap.
+
+        Input:
+            id: id of the Tree
+        Return:
+            A Tree object
+
+        Time complexity: O(D), where D is the number of roads leaving the Tree
+        Space complexity: O(D), where D is the number of roads leaving the Tree
+        """
+        view = Tree(id)
+        first = self.offsets[id]
+        unused = set(self._free.get(id, ()))
+        for e in range(first, self.offsets[id + 1]):
+            if e - first not in unused:
+                view.add_road(Road(id, self.targets[e], self.weights[e]))
+        k = self._solulu_index.get(id)
+        if k is not None:
+            view.solulu = True
+            view.claw_time = self.claw_times[k]
+            view.teleport_to = self.teleport_to[k]
+        return view
+
+    def nbytes(self):
+        """
+        Number of bytes taken by the arrays holding this TreeMap (the Roads, reversed Roads and solulus)
+        Complexity(Space and time): O(1)
+        """
+        return sum(getattr(self, name).itemsize * len(getattr(self, name)) for name in TREEMAP_ARRAYS)
+
+    def memory_budget(self, queries=1):
+        """
+        Number of bytes this TreeMap may take while it answers queries escape() at once: BYTES_PER_TREE per
+        Tree (and one more for the end offsets), BYTES_PER_ROAD per Road, half of it per free slot of each
+        direction, BYTES_PER_SOLULU per solulu, and BYTES_PER_QUERY_TREE per Tree for the SearchSpaces of
+        every query. nbytes() only measures the arrays, so it never exceeds memory_budget(0).
+
+        Input:
+            queries: number of escape() running at once, or of searches kept by the escape_many() cache
+        Return: the budget in bytes
+        Complexity(Space and time): O(F), where F is the number of Trees with free slots
+        """
+        trees = len(self.offsets) - 1
+        free = sum(len(slots) for slots in self._free.values())
+        reverse_free = sum(len(slots) for slots in self._reverse_free.values())
+        roads = len(self.targets) - free
+        return (BYTES_PER_TREE * (trees + 1) + BYTES_PER_ROAD * roads + BYTES_PER_ROAD // 2 * (free + reverse_free)
+                + BYTES_PER_SOLULU * len(self.solulu_ids) + BYTES_PER_QUERY_TREE * trees * queries)
+
+    @property
+    def adjacency_list(self):
+        """
+        List of Tree views, one per Tree id (see tree())
+
+        Time complexity: O(T+R), where T & R are the number of Trees and Roads
+        Space complexity: O(T+R)
+        """
+        return [self.tree(i) for i in range(len(self.offsets) - 1)]
+
+    def add_road(self, u, v, w):
+        """
+        Adds a Road from Tree u to Tree v taking w minutes, adding Trees u and v if they are new.
+        The last dynamic escape() is repaired rather than searched again.
+
+        Precondition: u and v are non-negative integers and w is a non-negative number
+        Postcondition: searches, cached or kept, give the times of the changed TreeMap
+
+        Input:
+            u, v, w: the Road
+        Time complexity:
+            Best case analysis: O(1), when u and v have free slots and no time gets shorter
+            Worst case analysis: O(T+R) to make room for the Road, plus the repair (see repair_shorter())
+        Space complexity: O(T+R), when the arrays have to grow
+        """
+        self._mutable()
+        self._fit(('weights', 'reverse_weights'), w)
+        if max(u, v) >= len(self.offsets) - 1:
+            self._grow(max(u, v) + 1)
+        _csr_insert(self.offsets, self.targets, self.weights, self._free, u, v, w)
+        _csr_insert(self.reverse_offsets, self.reverse_targets, self.reverse_weights, self._reverse_free, v, u, w)
+        #A new road can make a landmark closer, so its lower bounds may no longer hold
+        self.drop_landmarks()
+        self._changed(w)
+        self._repair(u, v, None, w)
+
+    def remove_road(self, u, v):
+        """
+        Removes every Road from Tree u to Tree v. The last dynamic escape() is repaired rather than searched again.
+
+        Precondition: there is a Road from u to v
+        Postcondition: searches, cached or kept, give the times of the changed TreeMap
+
+        Input:
+            u, v: Tree ids of the Road
+        Time complexity: O(D), where D is the number of roads of u and v, plus the repair (see repair_longer())
+        Space complexity: O(D)
+        """
+        self._mutable()
+        n = len(self.offsets) - 1
+        if not (0 <= u < n and 0 <= v < n) or _csr_remove(self.offsets, self.targets, self.weights,
+                                                             self._free, u, v) == 0:
+            raise ValueError("There is no road from " + str(u) + " to " + str(v))
+        _csr_remove(self.reverse_offsets, self.reverse_targets, self.reverse_weights, self._reverse_free, v, u)
+        self._changed()
+        self._repair(u, v, None, None)
+
+    def set_weight(self, u, v, w):
+        """
+        Sets the time of every Road from Tree u to Tree v to w minutes.
+        The last dynamic escape() is repaired rather than searched again.
+
+        Precondition: there is a Road from u to v and w is a non-negative number
+        Postcondition: searches, cached or kept, give the times of the changed TreeMap
+
+        Input:
+            u, v: Tree ids of the Road
+            w: new time of the Road
+        Time complexity: O(D), where D is the number of roads of u and v, plus the repair
+        Space complexity: O(D), or O(R) when the weights switch from integers to floats
+        """
+        self._mutable()
+        self._fit(('weights', 'reverse_weights'), w)
+        n = len(self.offsets) - 1
+        old = None
+        if 0 <= u < n and 0 <= v < n:
+            old = _csr_set(self.offsets, self.targets, self.weights, self._free, u, v, w)
+        if old is None:
+            raise ValueError("There is no road from " + str(u) + " to " + str(v))
+        _csr_set(self.reverse_offsets, self.reverse_targets, self.reverse_weights, self._reverse_free, v, u, w)
+        #Longer or removed roads keep the lower bounds of the landmarks valid, shorter ones do not
+        if w < old:
+            self.drop_landmarks()
+        self._changed(w)
+        self._repair(u, v, old, w)
+
+    def set_solulu(self, id, claw_time, teleport_to):
+        """
+        Makes Tree id a solulu, or changes the solulu, with the given claw_time and teleport_to.
+        Times of the searches do not depend on the solulus, so no search has to be repaired.
+
+        Input:
+            id: id of the Tree
+            claw_time: minutes it takes to claw the solulu
+            teleport_to: id of the Tree it teleports to
+        Time complexity: O(S), to index the solulus again
+        Space complexity: O(S)
+        """
+        self._mutable()
+        self._fit(('claw_times',), claw_time)
+        if max(id, teleport_to) >= len(self.offsets) - 1:
+            self._grow(max(id, teleport_to) + 1)
+        k = self._solulu_index.get(id)
+        if k is not None:
+            self.claw_times[k] = claw_time
+            self.teleport_to[k] = teleport_to
+        else:
+            self.solulu_ids.append(id)
+            self.claw_times.append(claw_time)
+            self.teleport_to.append(teleport_to)
+        self._index_solulus()
+        self._changed()
+
+    def _mutable(self):
+        """
+        Copies arrays read from shared memory or a snapshot file into array.array objects, which can be
+        changed and grown. The TreeMap stops reading the snapshot file.
+        Complexity(Space and time): O(T+R+S) the first time, O(1) afterwards
+        """
+        for name in TREEMAP_ARRAYS:
+            values = getattr(self, name)
+            if not isinstance(values, array):
+                setattr(self, name, array(_typecode(values), values))
+        self.__dict__.pop('_mapping', None)
+
+    def _fit(self, names, value):
+        """
+        Switches the named integer arrays to doubles when value is not an integer
+        Complexity(Space and time): O(n), where n is the length of the arrays, O(1) if nothing switches
+        """
+        if not isinstance(value, int) and _typecode(getattr(self, names[0])) == 'q':
+            for name in names:
+                setattr(self, name, array('d', getattr(self, name)))
+
+    def _grow(self, n):
+        """
+        Adds Trees without Roads up to n Trees. Every SearchSpace has one entry per Tree, so the cached and
+        pooled SearchSpaces and the dynamic search are dropped.
+        Complexity(Space and time): O(n)
+        """
+        self.changes += 1
+        self.clear_cache()
+        self._spaces = {}
+        self._dynamic = None
+        self.drop_landmarks()
+        extra = n - (len(self.offsets) - 1)
+        self.offsets.extend(array('q', [self.offsets[-1]]) * extra)
+        self.reverse_offsets.extend(array('q', [self.reverse_offsets[-1]]) * extra)
+        self.max = n - 1
+        self._index_solulus()
+
+    def _index_solulus(self):
+        """
+        Indexes the solulus by Tree id, and sets the goals of the searches: the solulus and teleport targets which
+        are Trees of this TreeMap. The others cannot be reached (no road leads to them).
+        Complexity(Space and time): O(S), where S is the number of solulus
+        """
+        n = len(self.offsets) - 1
+        self._solulu_index = {tree: k for k, tree in enumerate(self.solulu_ids)}
+        self._solulu_trees = frozenset(tree for tree in self.solulu_ids if 0 <= tree < n)
+        self._teleport_targets = frozenset(tree for tree in self.teleport_to if 0 <= tree < n)
+
+    def _trees(self, ids):
+        """
+        The ids which are Trees of this TreeMap, in the same order. An exit which no road leads to cannot be
+        reached, so it is left out rather than searched from.
+        Complexity(Space and time): O(E), where E is the number of ids
+        """
+        n = len(self.offsets) - 1
+        return [tree for tree in ids if 0 <= tree < n]
+
+    def _check_start(self, start):
+        """
+        Raises ValueError when start is not a Tree of this TreeMap
+        Complexity(Space and time): O(1)
+        """
+        if not 0 <= start < len(self.offsets) - 1:
+            raise ValueError("start {} is not a Tree of this TreeMap".format(start))
+
+    def _changed(self, weight=None):
+        """
+        Drops the cached searches of escape_many(), which are not repaired, the NumPy copies of the roads, and
+        the pooled BucketQueues when weight is larger than the largest weight they were made for
+        Time complexity: O(K), where K is the number of Trees discovered by the cached searches
+        Space complexity: O(1)
+        """
+        self.changes += 1
+        self.clear_cache()
+        self._vectors = None
+        if weight is not None and weight > self.max_weight:
+            self.max_weight = weight
+            for key in [key for key in self._spaces if key[0] is BucketQueue]:
+                del self._spaces[key]
+
+    def _repair(self, u, v, old, new):
+        """
+        Repairs both searches of the last dynamic escape() after the road u -> v changed from old to new
+        (None if there was no road, or there is none left)
+        Complexity: see repair_shorter() and repair_longer()
+        """
+        if self._dynamic is None:
+            return
+        key, forward, backward = self._dynamic
+        roads = (self.offsets, self.targets, self.weights)
+        reverse = (self.reverse_offsets, self.reverse_targets, self.reverse_weights)
+        #The road is u -> v in the search from the start and v -> u in the search from the exits
+        for space, out, into, a, b in ((forward, roads, reverse, u, v), (backward, reverse, roads, v, u)):
+            if new is not None and (old is None or new < old):
+                self.repair_shorter(space, out, a, b, new)
+            elif new is None or new > old:
+                self.repair_longer(space, out, into, a, b)
+
+    def repair_shorter(self, space, roads, a, b, weight):
+        """
+        Function description:
+        Repairs a finished search after a road a -> b of the given weight was added or made shorter.
+        Only the Trees whose time gets shorter through the road are searched again, starting from b.
+        :Input:
+            space: SearchSpace of a search run until its heap was empty
+            roads: (offsets, targets, weights) the search runs along
+            a, b: Tree ids of the road
+            weight: new weight of the road
+        Postcondition: space holds the times and routes of the changed roads
+        :Time complexity: O((K+D) log K), where K is the number of Trees whose time gets shorter and D their roads
+        :Space complexity: O(1), the state is kept in space
+        """
+        new_time = space.time[a] + weight
+        if new_time < space.time[b]:
+            space.discover(b, new_time)
+            space.previous[b] = a
+            space.visited[b] = False
+            space.heap.insert(new_time, b)
+            self.search(space, *roads)
+
+    def repair_longer(self, space, roads, reverse, a, b):
+        """
+        Function description:
+        Repairs a finished search after the road a -> b was made longer or removed. If the route to b used
+        the road, every Tree whose route goes through b loses its time, takes the best time over its roads from
+        Trees that kept theirs, and the search continues from those Trees.
+        :Input:
+            space: SearchSpace of a search run until its heap was empty
+            roads: (offsets, targets, weights) the search runs along
+            reverse: the same roads in the opposite direction
+            a, b: Tree ids of the road
+        Postcondition: space holds the times and routes of the changed roads
+        :Time complexity: O((K+D) log K), where K is the number of Trees whose route went through b and D
+                          the roads into and out of them
+        :Space complexity: O(K)
+        """
+        time, visited, previous = space.time, space.visited, space.previous
+        if previous[b] != a:
+            return
+        offsets, targets = roads[0], roads[1]
+        infinity = float('inf')
+
+        #Trees below b in the tree of routes formed by the previous array (the list grows while it is read),
+        #each one cut off as soon as it is found so that parallel roads do not list it twice
+        affected = [b]
+        previous[b] = -1
+        for tree in affected:
+            for road in range(offsets[tree], offsets[tree + 1]):
+                if previous[targets[road]] == tree:
+                    previous[targets[road]] = -1
+                    affected.append(targets[road])
+        for tree in affected:
+            time[tree] = infinity
+            visited[tree] = False
+
+        #Best time of every affected Tree over its roads from the Trees that kept their time
+        in_offsets, in_targets, in_weights = reverse
+        for tree in affected:
+            best, via = infinity, -1
+            for road in range(in_offsets[tree], in_offsets[tree + 1]):
+                if time[in_targets[road]] + in_weights[road] < best:
+                    best = time[in_targets[road]] + in_weights[road]
+                    via = in_targets[road]
+            if via != -1:
+                time[tree] = best
+                previous[tree] = via
+                space.heap.insert(best, tree)
+        self.search(space, *roads)
+
+    def escape(self, start, exits, heap=None, dynamic=False, stats=None, landmarks=False):
         """
         Finds the shortest time and route for a TreeMap with the given start and exits.
         Uses Dijkstra twice to find the shortest route.
@@ -75,268 +957,1678 @@ class TreeMap:
         Postcondition: returns None (If no route) or a tuple (min, [return_route])
 
         Input:
-            start: id of starting tree
-            exits: id of exit trees
+            start: id of starting tree, ValueError if no Tree has this id
+            exits: id of exit trees, the ids which are not Trees (higher than any road's) cannot be reached
+            heap: priority queue backend of both searches, a name in HEAPS ("binary", "4-ary", "pairing",
+                  "heapq", "bucket") or a class with the same interface as MinHeap. By default a BucketQueue
+                  when every road weight is an integer of at most BUCKET_MAX_WEIGHT, a MinHeap otherwise
+            dynamic: True to keep both searches complete after the query, so that add_road(), remove_road() and
+                     set_weight() repair them and the next dynamic escape() with the same start and exits only
+                     costs the O(S+P) combine step (see escape_dynamic())
+            stats: EscapeStats to add the counters and phase times of this query to (see escape_instrumented())
+            landmarks: True to answer with a search guided by the landmarks of preprocess_landmarks() instead
+                       (see escape_landmarks()). It only pays off when the landmarks bound the times well, on
+                       road-like forests, so it is never used by default.
         Return:
             (total_time, route):
             total_time: is the answer
             route: is the answer
 
         Time complexity: 
-            Best case analysis: O(R^2), where R is the number of roads in the TreeMap (Complexity of shortest_time() function)
-            Worst case analysis: O(R^2), where R is the number of roads in the TreeMap (Complexity of shortest_time() function)
+            Best case analysis: O(S), when no solulu can be reached from start and start has no roads
+            Worst case analysis: O((T+R) log T), where T, R are the number of trees and roads in the TreeMap (Dijkstra)
+                                 Only the Trees discovered before both searches stop are touched.
         Space complexity: 
-            Input space analysis: O(T), where T are the number of trees
-            Aux space analysis: O(T+R), T & R are the number of Trees and Roads in seld.adjacency_list
+            Input space analysis: O(E), where E are the number of exits
+            Aux space analysis: O(T), the SearchSpaces of both searches
         """
-      
-        final_routes = []
-        route = []
 
-        #Initializing MinHeap and inserting
-        self.adjacency_list[start].time = 0
-        discovered = MinHeap(len(self.adjacency_list))
-        for i in range(len(self.adjacency_list)):
-            discovered.insert(self.adjacency_list[i].time, self.adjacency_list[i])
+        if stats is not None or self.on_escape is not None:
+            return self.escape_instrumented(start, exits, heap, dynamic, stats, landmarks)
+        if dynamic:
+            return self.escape_dynamic(start, exits, heap)
+        if landmarks:
+            return self.escape_landmarks(start, exits, heap)
+        if heap is None:
+            heap = self.default_heap()
+
+        #Per query state lives in pooled SearchSpaces, the TreeMap itself is never written to
+        forward = self.acquire_space(heap)
+        backward = self.acquire_space(heap)
+        try:
+            #Dijkstra from the start tree until every solulu is finalized
+            self.search_to_solulus(forward, start)
+
+            #Earliest time each teleport target can be reached from start (after clawing)
+            arrival = self.arrival_times(forward.time)
+            if len(arrival) == 0:
+                return None
+
+            #Dijkstra on the reversed treemap from every exit at once (Shortest path from exit to solulus),
+            #until no teleport target left can give a shorter time
+            self.search_from_exits(backward, exits, arrival)
+
+            return self.combine(forward, backward)
+        finally:
+            #Handing the SearchSpaces back, cleared, for the next query
+            self.release_space(forward)
+            self.release_space(backward)
+
+    def escape_instrumented(self, start, exits, heap=None, dynamic=False, stats=None, landmarks=False):
+        """
+        escape() which counts what it does: the heaps of both searches are wrapped in a CountingHeap and every
+        phase is timed. The roads relaxed are the roads of the Trees finalized, as a search relaxes every road of
+        a Tree when it finalizes it, so the search loop itself is not instrumented. The filled EscapeStats is
+        passed to self.on_escape, if set.
 
-        #Updating the start tree with a start time of 0
-        discovered.update(self.adjacency_list[start].time, self.adjacency_list[start])
+        Input:
+            start, exits, heap, dynamic, landmarks: as taken by escape()
+            stats: EscapeStats to add to, a new one if None
+        Return:
+            None (If no route) or (total_time, route)
 
-        #Dijkstra
-        while discovered.size > 0:
-        
-            current = discovered.serve() #Serve min item from the heap
-            current.visited = True   #Time finalized for current
-            current.discovered = True
+        Time complexity: the complexity of escape(), plus O(K) to count the Trees finalized
+        Space complexity: O(T), the SearchSpaces of both searches
+        """
+        if stats is None:
+            stats = EscapeStats()
+        begin = perf_counter()
+        if dynamic or landmarks:
+            #Other engines are only timed as a whole
+            if dynamic:
+                answer = self.escape_dynamic(start, exits, heap)
+            else:
+                answer = self.escape_landmarks(start, exits, heap)
+            stats.times['total'] = stats.times.get('total', 0) + perf_counter() - begin
+            if self.on_escape is not None:
+                self.on_escape(stats)
+            return answer
+        if heap is None:
+            heap = self.default_heap()
+
+        times = stats.times
+        forward = self.acquire_space(heap)
+        backward = self.acquire_space(heap)
+        heaps = forward.heap, backward.heap
+        forward.heap = CountingHeap(forward.heap, stats)
+        backward.heap = CountingHeap(backward.heap, stats)
+        try:
+            self.search_to_solulus(forward, start)
+            mark = perf_counter()
+            times['forward'] = times.get('forward', 0) + mark - begin
+
+            arrival = self.arrival_times(forward.time)
+            times['arrival'] = times.get('arrival', 0) + perf_counter() - mark
+            answer = None
+            if len(arrival) > 0:
+                mark = perf_counter()
+                self.search_from_exits(backward, exits, arrival)
+                times['backward'] = times.get('backward', 0) + perf_counter() - mark
+
+                mark = perf_counter()
+                answer = self.combine(forward, backward)
+                times['combine'] = times.get('combine', 0) + perf_counter() - mark
+
+            #Counting the Trees finalized and their roads
+            for space, offsets in ((forward, self.offsets), (backward, self.reverse_offsets)):
+                visited = space.visited
+                for tree in space.touched:
+                    if visited[tree]:
+                        stats.settled += 1
+                        stats.relaxed += offsets[tree + 1] - offsets[tree]
+        finally:
+            forward.heap, backward.heap = heaps
+            self.release_space(forward)
+            self.release_space(backward)
+        times['total'] = times.get('total', 0) + perf_counter() - begin
+        if self.on_escape is not None:
+            self.on_escape(stats)
+        return answer
+
+    def escape_dynamic(self, start, exits, heap=None):
+        """
+        escape() which keeps its searches: both run until every reachable Tree is finalized, and are kept until
+        the next dynamic escape() with another start or exits. Every change of a road repairs them in place
+        (see repair_shorter() and repair_longer()) instead of searching the whole TreeMap again.
 
-            #route keeps track of the time and the tree
-            route.append([current.time, current.id])
+        Input:
+            start: id of starting tree
+            exits: id of exit trees
+            heap: priority queue backend of new searches, the binary MinHeap by default. A BucketQueue cannot
+                  go back to an earlier time, which a repair needs, so "bucket" is not supported.
+        Return:
+            None (If no route) or (total_time, route)
 
-            # Perform edge relaxation on all of the roads connected to the tree
-            for road in current.roads:
-                v_int = road.v
-                v = self.adjacency_list[v_int]
-
-                # If tree has not been discovered
-                if v.discovered == False:
-                    v.discovered = True
-                    v.time = current.time + road.w
-                    v.previous = current
-                    discovered.update(v.time, v)   #Updating Tree v in heap as v.time has changed
-
-                #If tree time has not been finalized
-                elif v.visited == False:
-                    if v.time > current.time + road.w:
-                        v.time = current.time + road.w
-                        v.previous = current
-                        discovered.update(v.time, v)   #Updating Tree v in heap as v.time changed
+        Time complexity: O(S+P) when the searches are kept, O((T+R) log T) otherwise
+        Space complexity: O(T), the kept SearchSpaces
+        """
+        self._check_start(start)
+        key = (start, frozenset(exits))
+        if self._dynamic is None or self._dynamic[0] != key:
+            if heap is None:
+                heap = "binary"
+            if (HEAPS[heap] if isinstance(heap, str) else heap) is BucketQueue:
+                raise ValueError("A BucketQueue cannot repair a search, use another heap")
+            self.drop_dynamic()
+            forward = self.acquire_space(heap)
+            backward = self.acquire_space(heap)
+            forward.seed(start, 0)
+            self.search(forward, self.offsets, self.targets, self.weights)
+            self.search(backward, *self.reverse_treemap(exits, backward))
+            self._dynamic = (key, forward, backward)
+        return self.combine(self._dynamic[1], self._dynamic[2])
+
+    def drop_dynamic(self):
+        """
+        Stops keeping the searches of the last dynamic escape(), handing their SearchSpaces back to the pool
+        Time complexity: O(K), where K is the number of Trees discovered by the searches
+        Space complexity: O(1)
+        """
+        if self._dynamic is not None:
+            key, forward, backward = self._dynamic
+            self._dynamic = None
+            self.release_space(forward)
+            self.release_space(backward)
 
-    
+    def preprocess_landmarks(self, count=8, heap=None):
+        """
+        Picks up to count landmark Trees and stores the time from every landmark to every Tree and from every
+        Tree to every landmark. By the triangle inequality these give lower bounds on the time between any two
+        Trees, which escape(..., landmarks=True) then uses to search towards the solulus and exits only
+        (see escape_landmarks()).
 
-        #Adding the initial routes of each Tree into a list so that we can access them even after the reversal of the tree
-        # initial_routes is a list containing lists of numbers(Tree Id's)
-        initial_routes = []
+        The first landmark is the Tree with the most roads, every next one the Tree furthest (there and back)
+        from the landmarks picked so far, Trees which no landmark reaches coming first.
 
-        for items in route:
-            item = self.adjacency_list[items[1]] #Access the Tree object in the adjacency list
-            add_route = [item.id]  #Starting point of the route is the Tree's ID
-            #Adding the Tree.id's taken in a route 
-            while item.previous != None:
-                add_route.append(item.previous.id)
-                item = self.adjacency_list[item.previous.id]
-            initial_routes.append(add_route) #Adds the route for each tree as a list into initial_routes
+        Precondition: count is a positive integer
+        Postcondition: escape(..., landmarks=True) can use the landmarks until a road is added or made shorter
 
-    
+        Input:
+            count: largest number of landmarks
+            heap: priority queue backend of the searches from and to the landmarks (see escape())
+        Time complexity: O(L*(T+R) log T), two complete searches per landmark, where L is the number of landmarks
+        Space complexity: O(L*T), two times per Tree and landmark
+        """
+        if heap is None:
+            heap = self.default_heap()
+        n = len(self.offsets) - 1
+        infinity = float('inf')
+        degree = [self.offsets[t + 1] - self.offsets[t] + self.reverse_offsets[t + 1] - self.reverse_offsets[t]
+                  for t in range(n)]
+
+        landmarks, times_from, times_to = array('q'), [], []
+        #Smallest time from a landmark to a Tree and back, over the landmarks picked so far
+        spread = [infinity] * n
+        landmark = max(range(n), key=degree.__getitem__)
+        while len(landmarks) < count and landmark != -1:
+            landmarks.append(landmark)
+            for roads, times in ((self.offsets, self.targets, self.weights), times_from), \
+                                ((self.reverse_offsets, self.reverse_targets, self.reverse_weights), times_to):
+                space = self.acquire_space(heap)
+                space.seed(landmark, 0)
+                self.search(space, *roads)
+                times.append(array('d', space.time))
+                self.release_space(space)
+            for t in range(n):
+                spread[t] = min(spread[t], times_from[-1][t] + times_to[-1][t])
+
+            landmark, furthest = -1, -1
+            for t in range(n):
+                if degree[t] > 0 and spread[t] > furthest and t not in landmarks:
+                    landmark, furthest = t, spread[t]
+
+        self.landmarks = landmarks
+        self._landmark_from = times_from
+        self._landmark_to = times_to
+
+    def drop_landmarks(self):
+        """
+        Drops the landmarks, escape(..., landmarks=True) raises ValueError until they are preprocessed again
+        Complexity(Space and time): O(1)
+        """
+        self.landmarks = None
+        self._landmark_from = None
+        self._landmark_to = None
 
-        reversed_route = []
+    def escape_landmarks(self, start, exits, heap=None):
+        """
+        escape() as a single A* search guided by the landmarks of preprocess_landmarks().
+        The search runs over two copies of the forest: id t is Tree t before clawing a solulu and id T+t is
+        Tree t after teleporting, each solulu s having a road of claw_time from s to T+teleport_to. The first
+        exit finalized in the second copy gives the shortest time. Every id is ordered by its time plus a lower
+        bound on the time left, built from the landmarks, so Trees leading away from the solulus and exits are
+        rarely finalized.
+
+        Precondition: preprocess_landmarks() has run since the last road was added or made shorter, ValueError
+                      otherwise
+        Input:
+            start: id of starting tree
+            exits: id of exit trees
+            heap: priority queue backend, the binary MinHeap by default. The bounds let times jump by more than
+                  a road weight, so "bucket" is not supported.
+        Return:
+            None (If no route) or (total_time, route), as escape()
 
-        #Reversing the tree map (Flipping the TreeMap to find the shortest path from exit to solulus)
-        reversed_treemap = self.reverse_treemap(self.adjacency_list, exits)
+        Time complexity: O(S*L + (K+D)(L + log K)), where L is the number of landmarks, K the ids finalized and D
+                         their roads
+        Space complexity: O(T+S*L), the SearchSpace over both copies of the forest
+        """
+        if self.landmarks is None:
+            raise ValueError("No landmarks, call preprocess_landmarks() first")
+        if heap is None:
+            heap = "binary"
+        if (HEAPS[heap] if isinstance(heap, str) else heap) is BucketQueue:
+            raise ValueError("A BucketQueue cannot order a search by lower bounds, use another heap")
+        self._check_start(start)
+        n = len(self.offsets) - 1
+        infinity = float('inf')
+        exits = set(self._trees(exits))
+
+        #Bounds on the time from a Tree to the nearest exit, from every landmark L: the time from L to the
+        #nearest exit minus the time from L to the Tree, and the time from the Tree to L minus the longest time
+        #from an exit to L
+        exit_terms = []
+        for times_from, times_to in zip(self._landmark_from, self._landmark_to):
+            exit_terms.append((times_from, min((times_from[x] for x in exits), default=infinity),
+                               times_to, max((times_to[x] for x in exits), default=infinity)))
+
+        def exit_bound(tree):
+            bound = 0
+            for times_from, nearest, times_to, furthest in exit_terms:
+                if times_from[tree] != infinity and nearest - times_from[tree] > bound:
+                    bound = nearest - times_from[tree]
+                if furthest != infinity and times_to[tree] - furthest > bound:
+                    bound = times_to[tree] - furthest
+            return bound
+
+        #Lower bound on the rest of the escape from each solulu (claw_time plus the bound of its teleport target),
+        #infinity for the solulus and teleport targets which are not Trees
+        teleports = self._solulu_index
+        rest = []
+        for k in range(len(self.solulu_ids)):
+            if 0 <= self.solulu_ids[k] < n and 0 <= self.teleport_to[k] < n:
+                rest.append(self.claw_times[k] + exit_bound(self.teleport_to[k]))
+            else:
+                rest.append(infinity)
+        least = min(rest, default=infinity)
+
+        #Bounds on the time from a Tree to a solulu plus its rest, from every landmark L, through the time from
+        #L (all solulus at once), through the time to L (solulus which reach L) and the rest of the others
+        solulu_terms = []
+        for times_from, times_to in zip(self._landmark_from, self._landmark_to):
+            through_from, through_to, others = infinity, infinity, infinity
+            for k in range(len(self.solulu_ids)):
+                solulu = self.solulu_ids[k]
+                if rest[k] == infinity:
+                    continue
+                through_from = min(through_from, times_from[solulu] + rest[k])
+                if times_to[solulu] != infinity:
+                    through_to = min(through_to, rest[k] - times_to[solulu])
+                else:
+                    others = min(others, rest[k])
+            solulu_terms.append((times_from, through_from, times_to, through_to, others))
+
+        def solulu_bound(tree):
+            bound = least
+            for times_from, through_from, times_to, through_to, others in solulu_terms:
+                if times_from[tree] != infinity and through_from - times_from[tree] > bound:
+                    bound = through_from - times_from[tree]
+                if min(times_to[tree] + through_to, others) > bound:
+                    bound = min(times_to[tree] + through_to, others)
+            return bound
+
+        space = self.acquire_space(heap, 2 * n)
+        try:
+            time, visited, previous, touched = space.time, space.visited, space.previous, space.touched
+            queue = space.heap
+            #Lower bound of every id discovered so far
+            bounds = {}
+
+            def relax(node, v, new_time):
+                if new_time < time[v] and not visited[v]:
+                    if v not in bounds:
+                        bounds[v] = exit_bound(v - n) if v >= n else solulu_bound(v)
+                    if bounds[v] == infinity:
+                        return
+                    previous[v] = node
+                    if time[v] == infinity:
+                        touched.append(v)
+                        time[v] = new_time
+                        queue.insert(new_time + bounds[v], v)
+                    else:
+                        time[v] = new_time
+                        queue.update(new_time + bounds[v], v)
+
+            relax(-1, start, 0)
+            while queue.size > 0:
+                node = queue.serve()
+                visited[node] = True
+                layer = 0 if node < n else n
+                tree = node - layer
+                if layer == n and tree in exits:
+                    return time[node], self._layered_route(previous, node, n)
+
+                for road in range(self.offsets[tree], self.offsets[tree + 1]):
+                    relax(node, layer + self.targets[road], time[node] + self.weights[road])
+                if layer == 0 and tree in teleports:
+                    k = teleports[tree]
+                    if rest[k] != infinity:
+                        relax(node, n + self.teleport_to[k], time[node] + self.claw_times[k])
+            return None
+        finally:
+            self.release_space(space)
 
-        reversed_treemap[-1].time = 0
-        
-        #Initializing MinHeap
-        discovered2 = MinHeap(len(reversed_treemap))
-        #Inserting 
-        for i in range(len(reversed_treemap)):
-            discovered2.insert(reversed_treemap[i].time, reversed_treemap[i])
-        
-        #Updating the start tree (The new Tree added when reversing)
-        discovered2.update(reversed_treemap[-1].time, reversed_treemap[-1])
-
-        #Dijkstra
-        while discovered2.size > 0:
-            current = discovered2.serve()   #Serve min item from the heap
-            current.visited = True    #Time finalized for current
-            current.discovered = True
-            
-            #Appending time, tree and tree id into reversed_route
-            # We do this as reversed_route is used to retrieve the time and the route in our output
-            reversed_route.append([current.time, current, current.id])  
+    def _layered_route(self, previous, node, n):
+        """
+        Route of escape_landmarks() ending at id node, as Tree ids. A solulu teleporting to itself is only
+        listed once.
+        Complexity(Space and time): O(P), where P is the length of the route
+        """
+        path = self.follow(previous, node)
+        path.reverse()
+        route = []
+        for k in range(len(path)):
+            if path[k] >= n and path[k - 1] == path[k] - n:
+                continue
+            route.append(path[k] % n)
+        return route
 
-            # Perform edge relaxation on all of the roads connected to the tree
-            for road in current.roads:
-                v_int = road.v
-                v = self.adjacency_list[v_int]
-              
-                #If not discovered, set discovered to true and update the time of the Tree
-                if v.discovered == False:                 
-                    v.discovered = True    
-                    v.time = current.time + road.w
-                    v.previous = current
-                  
-                    discovered2.update(v.time, v)  #Updating Tree v in heap as v.time changed
-                #If v.time is not finalized
-                elif v.visited == False:
-                    #If a shorter route is found, update time
-                    if v.time > current.time + road.w:
-                        v.time = current.time + road.w
-                        v.previous = current
-                        discovered2.update(v.time, v)   #Updating Tree v in heap with lesser duration, v.time
-        
+    def escape_vectorized(self, start, exits, delta=None):
+        """
+        escape() with both searches run by delta_stepping(), which relaxes whole batches of roads with NumPy
+        array operations instead of one road at a time. The times are the same as escape(); when several routes
+        are equally short, the route may differ.
+
+        Precondition: NumPy is installed
+        Input:
+            start: id of starting tree
+            exits: id of exit trees
+            delta: width of the buckets of delta_stepping(), the mean road weight if None
+        Return:
+            None (If no route) or (total_time, route), as escape()
+
+        Time complexity: O(B*(T+R) log(T+R)) in the worst case, where B is the number of buckets, usually far
+                         fewer array operations than roads
+        Space complexity: O(T+R), the NumPy copies of the roads and the arrays of both searches
+        """
+        if numpy is None:
+            raise ImportError("escape_vectorized() needs NumPy")
+        self._check_start(start)
+        if self._vectors is None:
+            self._vectors = [(numpy.array(offsets, dtype=numpy.int64), numpy.array(targets, dtype=numpy.int64),
+                              numpy.array(weights, dtype=numpy.float64))
+                             for offsets, targets, weights in
+                             ((self.offsets, self.targets, self.weights),
+                              (self.reverse_offsets, self.reverse_targets, self.reverse_weights))]
+        roads, reverse = self._vectors
+        if delta is None:
+            delta = float(roads[2].mean()) if len(roads[2]) > 0 else 1.0
+            if delta <= 0:
+                delta = 1.0
+
+        forward = self.delta_stepping([start], roads, delta, list(self._solulu_trees))
+        backward = self.delta_stepping(self._trees(exits), reverse, delta, list(self._teleport_targets))
+        answer = self.combine(forward, backward)
+        if answer is None:
+            return None
+        #Times are computed as doubles, integer forests get integer totals back
+        total, route = answer
+        if _typecode(self.weights) == 'q' and _typecode(self.claw_times) == 'q':
+            total = int(total)
+        else:
+            total = float(total)
+        return total, [int(tree) for tree in route]
+
+    def delta_stepping(self, sources, roads, delta, goals=()):
+        """
+        Function description:
+        Delta-stepping from every Tree in sources at once. Trees are kept in buckets of width delta by time, and the
+        lowest bucket is emptied by relaxing the light roads (weight at most delta) of all its Trees together,
+        again and again while Trees fall into it, then their heavy roads once. Each relaxation is a batch of
+        NumPy operations: gather the roads of the Trees, compute their times, and keep the shortest time per Tree.
+        The search ends once every Tree in goals is finalized or no Tree is left.
+        :Input:
+            sources: Tree ids starting with a time of 0
+            roads: (offsets, targets, weights) as NumPy arrays (int64, int64, float64)
+            delta: width of the buckets, a positive number
+            goals: Tree ids to stop at
+        Postcondition: every Tree finalized has its shortest time, and previous links it to a source along
+                       a shortest route
+        Return: an object with a time and a previous array, read like a SearchSpace by combine()
+        :Time complexity: O(B*(T+R) log(T+R)) in the worst case, where B is the number of buckets
+        :Space complexity: O(T+R)
+        """
+        n = len(roads[0]) - 1
+        time = numpy.full(n, numpy.inf)
+        previous = numpy.full(n, -1, dtype=numpy.int64)
+        settled = numpy.zeros(n, dtype=bool)
+        pending = numpy.unique(numpy.asarray(sources, dtype=numpy.int64))
+        time[pending] = 0
+        goals = numpy.unique(numpy.asarray(goals, dtype=numpy.int64))
+
+        while True:
+            #Trees discovered and not finalized, the lowest bucket holding some of them
+            pending = numpy.unique(pending[~settled[pending]])
+            if len(pending) == 0:
+                break
+            lowest = time[pending].min()
+            end = (numpy.floor(lowest / delta) + 1) * delta
+            if end <= lowest:
+                end = numpy.nextafter(lowest, numpy.inf)
+
+            frontier = pending[time[pending] < end]
+            emptied = []
+            while len(frontier) > 0:
+                emptied.append(frontier)
+                shorter = self._relax_batch(frontier, roads, time, previous, delta, light=True)
+                pending = numpy.concatenate((pending, shorter))
+                frontier = shorter[time[shorter] < end]
+            emptied = numpy.unique(numpy.concatenate(emptied))
+            pending = numpy.concatenate((pending, self._relax_batch(emptied, roads, time, previous, delta, light=False)))
+            settled[emptied] = True
+
+            if len(goals) > 0 and settled[goals].all():
+                break
+        return SimpleNamespace(time=time, previous=previous)
+
+    def _relax_batch(self, trees, roads, time, previous, delta, light):
+        """
+        Relaxes the light (weight at most delta) or heavy roads leaving trees together. Among the roads into a
+        Tree the shortest time wins, ties going to the lowest Tree id, and it is kept only if it is shorter.
+        Return: NumPy array of the Tree ids whose time got shorter
+        Time complexity: O(D log D), where D is the number of roads leaving trees
+        Space complexity: O(D)
+        """
+        offsets, targets, weights = roads
+        firsts = offsets[trees]
+        counts = offsets[trees + 1] - firsts
+        #Position of every road of trees in the CSR arrays, and the Tree it leaves
+        starts = numpy.repeat(firsts - numpy.cumsum(counts) + counts, counts)
+        positions = starts + numpy.arange(len(starts))
+        heads = numpy.repeat(trees, counts)
+        road_weights = weights[positions]
+        keep = road_weights <= delta if light else road_weights > delta
+        heads, tails = heads[keep], targets[positions[keep]]
+        times = time[heads] + road_weights[keep]
+
+        order = numpy.lexsort((heads, times, tails))
+        heads, tails, times = heads[order], tails[order], times[order]
+        first = numpy.ones(len(tails), dtype=bool)
+        first[1:] = tails[1:] != tails[:-1]
+        shorter = first & (times < time[tails])
+        tails = tails[shorter]
+        time[tails] = times[shorter]
+        previous[tails] = heads[shorter]
+        return tails
+
+    def combine(self, forward, backward):
+        """
+        Combines a search from the start (every solulu finalized) and a search from the exits into the shortest
+        time and route out of the forest. Only the route through the chosen solulu is rebuilt.
 
-       #Function shortest_time is called to find the minimum time to exit the forest 
-       #and the index of the minimum time among the final_routes
-        min, index = self.shortest_time(route, reversed_route, exits, final_routes)
+        Input:
+            forward: SearchSpace of the search from the start
+            backward: SearchSpace of the search from the exits
+        Return:
+            None (If no route) or (total_time, route)
+
+        Time complexity: O(S+P), where S is the number of solulus and P the length of the route
+        Space complexity: O(S+P), where S is the number of solulus and P the length of the route
+        """
+        #Function shortest_time is called to find the minimum time to exit the forest 
+        #and the solulu it goes through
+        min, index = self.shortest_time(forward.time, backward.time)
 
         # If min is float('inf'), it would mean there is no path out of the forest
         # So return None
         if min == float('inf'):
             return None
 
-        # obtaining the route of the reversed treemap
-        reverse_tree = final_routes[index][2]
-        reverse_trees = [reverse_tree.id]
-        #Accessing previous to find the route
-        while reverse_tree.previous != None:
-            reverse_trees.append(reverse_tree.previous.id)
-            reverse_tree = reverse_tree.previous
-        #Reverse tree route
-        # reverse_trees = reverse_trees[:-1]
-
-        # obtaining the route of the original treemap
-        for i in range(len(initial_routes)):
-            #Checks if the initial routes and reverse_tree Tree's match, if yes initial route is found
-            if self.adjacency_list[initial_routes[i][0]] == reversed_treemap[reverse_trees[0]]:
-                initial_path = initial_routes[i]
-                initial_path.pop(0)
-                initial_path.reverse() #Initial route obtained after reversing
-                break
+        solulu, teleport_to = self.solulu_ids[index], self.teleport_to[index]
+
+        # obtaining the route of the original treemap, from start to the solulu
+        initial_path = self.follow(forward.previous, solulu)
+        initial_path.reverse()
+
+        # obtaining the route of the reversed treemap, from the teleport target to an exit
+        reverse_trees = self.follow(backward.previous, teleport_to)
+        #A solulu teleporting to itself is only listed once
+        if teleport_to == solulu:
+            reverse_trees.pop(0)
 
-        reverse_trees.pop() #Removes last item from reverse_trees
         #Concatenate the routes to find the entire route
-        return_route =  initial_path + reverse_trees
-      
+        return min, initial_path + reverse_trees
+
+    def escape_many(self, queries, heap=None):
+        """
+        Answers a batch of escape queries. The search from each distinct start and from each distinct set of exits
+        is run once and kept in a least recently used cache of at most self.cache_size searches, so a query whose
+        start and exits were both searched before only costs the O(S) combine step.
+
+        Precondition: every query is a (start, exits) pair as taken by escape()
+        Postcondition: the cache holds the most recently used searches
+
+        Input:
+            queries: iterable of (start, exits) pairs
+            heap: priority queue backend of the searches (see escape())
+        Return:
+            List with the answer of escape() for every query, in the same order
+
+        Time complexity: 
+            Best case analysis: O(Q*(S+P)), when every search is cached, where Q is the number of queries
+            Worst case analysis: O(Q*(T+R) log T), when no search is cached
+        Space complexity: 
+            Input space analysis: O(Q*E), where E is the largest number of exits of a query
+            Aux space analysis: O(C*T), where C is self.cache_size
+        """
+        if heap is None:
+            heap = self.default_heap()
+
+        answers = []
+        for start, exits in queries:
+            exits = frozenset(exits)
+            forward = self.cached_search(('start', start), heap,
+                                         lambda space: self.search_to_solulus(space, start))
+            #Without arrival times the search from the exits finalizes every teleport target, so it can be
+            #combined with any start
+            backward = self.cached_search(('exits', exits), heap,
+                                          lambda space: self.search_from_exits(space, exits))
+            answers.append(self.combine(forward, backward))
+            self.trim_cache()
+        return answers
+
+    def cached_search(self, key, heap, run):
+        """
+        Returns the cached SearchSpace for key, or runs a new search with run and caches it
+
+        Input:
+            key: ('start', start) or ('exits', frozenset of exits)
+            heap: priority queue backend of a new search
+            run: function running the search on a cleared SearchSpace
+        Return: A SearchSpace holding the finished search
+
+        Time complexity: O(1) if key is cached, the complexity of run otherwise
+        Space complexity: O(1) if key is cached, O(T) otherwise
+        """
+        space = self._cache.get(key)
+        if space is not None:
+            self._cache.move_to_end(key)
+            return space
+        space = self.acquire_space(heap)
+        try:
+            run(space)
+        except BaseException:
+            #A search which failed is not cached, its SearchSpace goes back to the pool
+            self.release_space(space)
+            raise
+        self._cache[key] = space
+        return space
+
+    def trim_cache(self):
+        """
+        Evicts the least recently used searches until at most self.cache_size are cached, handing their
+        SearchSpaces back to the pool
+        Time complexity: O(K), where K is the number of Trees discovered by the evicted searches
+        Space complexity: O(1)
+        """
+        while len(self._cache) > self.cache_size:
+            self.release_space(self._cache.popitem(last=False)[1])
+
+    def clear_cache(self):
+        """
+        Evicts every cached search
+        Time complexity: O(K), where K is the number of Trees discovered by the cached searches
+        Space complexity: O(1)
+        """
+        while len(self._cache) > 0:
+            self.release_space(self._cache.popitem(last=False)[1])
+
+    def default_heap(self):
+        """
+        Picks the priority queue backend for this TreeMap: Dial's BucketQueue when every road weight is a
+        non-negative integer of at most BUCKET_MAX_WEIGHT, which makes each search O(T+R+W), the binary
+        MinHeap otherwise
+
+        Return: A name in HEAPS
+        Complexity(Space and time): O(1)
+        """
+        if _typecode(self.weights) == 'q' and self.max_weight <= BUCKET_MAX_WEIGHT:
+            return "bucket"
+        return "binary"
+
+    def acquire_space(self, heap="binary", size=None):
+        """
+        Takes a cleared SearchSpace out of this TreeMap's pool, creating one if the pool is empty
+
+        Input:
+            heap: priority queue backend of the SearchSpace, a name in HEAPS or a heap class
+            size: number of ids the SearchSpace holds, one per Tree if None
+        Return: A SearchSpace in which every id is undiscovered
+
+        Time complexity: O(1) if the pool is not empty, O(T) otherwise
+        Space complexity: O(1) if the pool is not empty, O(T) otherwise
+        """
+        heap_class = HEAPS[heap] if isinstance(heap, str) else heap
+        n = len(self.offsets) - 1 if size is None else size
+        pool = self._spaces.setdefault((heap_class, n), [])
+        if len(pool) > 0:
+            return pool.pop()
+        if heap_class is BucketQueue:
+            return SearchSpace(n, BucketQueue(n, self.max_weight))
+        return SearchSpace(n, heap_class(n))
+
+    def release_space(self, space):
+        """
+        Clears space and puts it back into this TreeMap's pool so that a later query can reuse it
+
+        Input:
+            space: A SearchSpace taken with acquire_space()
+
+        Time complexity: O(K), where K is the number of Trees discovered in space
+        Space complexity: O(1)
+        """
+        space.reset()
+        self._spaces[(type(space.heap), len(space.time))].append(space)
 
-        return min, return_route
     
 
 
-    def shortest_time(self, route, reversed_route, exits, final_routes):
+    def shortest_time(self, time, time2):
         """
         Function description: 
-        Finds the shortest time taken from the start to an exit using the information stored in routes
-        and reversed_route
+        Finds the shortest time taken from the start to an exit through every solulu at once: the time to
+        the solulu, plus its claw_time, plus the time from the Tree it teleports to to the nearest exit.
+        The reverse time of the teleport target is read directly by its id.
         :Input:
-            route: Dijkstra output of original graph
-            reversed_route: Dijkstra output of reversed graph
-            exits: List of exit trees
-            final_routes: The combined routes to exit the forest
-        Precondition: All inputs are a list
-        Postcondition: min is a non-negative integer or infinity and i is the index of min in the heap
-        Return: The minimum time to exit forest and the index of the minimum time among the final_routes
+            time: Times of the Dijkstra on the original graph, indexed by Tree id
+            time2: Times of the Dijkstra on the reversed graph, indexed by Tree id
+        Precondition: time and time2 have an entry for every Tree
+        Postcondition: min is a non-negative number or infinity and index is the position of its solulu.
+                       A solulu or teleport target which is not a Tree cannot be reached, its total is infinity
+        Return: The minimum time to exit forest and the index of the solulu in self.solulu_ids it goes through
+                (-1 if there are no solulus)
         :Time complexity:
-            Best and Worst-case: O(R^2) where R is the number of Roads in route
-        :Time complexity analysis: O(R^2), iterating through reversed_route for each item in route
+            Best and Worst-case: O(S) where S is the number of solulus
+        :Time complexity analysis: O(S), one total per solulu and a min over the totals
+
+        :Space complexity:
+        :Input space: O(T), where T is the length of time & time2
+        :Aux space: O(S), where S is the number of solulus
+
+        """
+        #Total time to exit through each solulu, computed over the solulu arrays in one pass
+        n, infinity = len(time), float('inf')
+        totals = [time[tree] + claw_time + time2[teleport_to] if 0 <= tree < n and 0 <= teleport_to < n else infinity
+                  for tree, claw_time, teleport_to in zip(self.solulu_ids, self.claw_times, self.teleport_to)]
+        if len(totals) == 0:
+            return float('inf'), -1
+
+        #First solulu with the minimum total
+        index = min(range(len(totals)), key=totals.__getitem__)
+        return totals[index], index
+
+    def search_to_solulus(self, space, start):
+        """
+        Function description: 
+        Dijkstra from start which stops as soon as every solulu is finalized
+        :Input:
+            space: A cleared SearchSpace
+            start: id of starting tree
+        Postcondition: the time of every solulu in space is final (infinity if it cannot be reached)
+        :Time complexity: O((T+R) log T) in the worst case, only the Trees closer to start than the furthest
+                          solulu are finalized
+        :Space complexity: O(1), the state is kept in space
+        """
+        self._check_start(start)
+        space.seed(start, 0)
+        remaining = len(self._solulu_trees)
+        while remaining > 0 and self.search(space, self.offsets, self.targets, self.weights, self._solulu_trees) != -1:
+            remaining -= 1
+
+    def arrival_times(self, time):
+        """
+        Function description: 
+        Finds the earliest time each teleport target can be reached from the start, through any solulu
+        teleporting to it (time to the solulu plus its claw_time)
+        :Input:
+            time: times of the search from the start, indexed by Tree id
+        Return: dictionary of teleport target id -> time, without the targets that cannot be reached
+        :Time complexity: O(S), where S is the number of solulus
+        :Space complexity: O(S), where S is the number of solulus
+        """
+        arrival = {}
+        n = len(time)
+        for tree, claw_time, teleport_to in zip(self.solulu_ids, self.claw_times, self.teleport_to):
+            if not (0 <= tree < n and 0 <= teleport_to < n):
+                continue
+            reached = time[tree] + claw_time
+            if reached < arrival.get(teleport_to, float('inf')):
+                arrival[teleport_to] = reached
+        return arrival
+
+    def search_from_exits(self, space, exits, arrival=None):
+        """
+        Function description: 
+        Dijkstra on the reversed treemap from every exit at once, which stops once every teleport target in
+        arrival is finalized. Given the arrival times, it also stops as soon as the next time served is so large
+        that no teleport target left could beat the best total found so far.
+        :Input:
+            space: A cleared SearchSpace
+            exits: List of exit trees
+            arrival: dictionary of teleport target id -> earliest time it can be reached from the start,
+                     or None to finalize every teleport target without a bound
+        Postcondition: for every teleport target t, time[t] in space is final or t cannot give a shorter total
+                       than the best one found
+        :Time complexity: O((T+R) log T) in the worst case
+        :Space complexity: O(1), the state is kept in space
+        """
+        offsets, targets, weights = self.reverse_treemap(exits, space)
+        if arrival is None:
+            goals, remaining = self._teleport_targets, len(self._teleport_targets)
+            while remaining > 0 and self.search(space, offsets, targets, weights, goals) != -1:
+                remaining -= 1
+            return
+
+        best = float('inf')
+        #Every total is at least the earliest arrival plus the time served
+        earliest = min(arrival.values())
+        remaining = len(arrival)
+        while remaining > 0:
+            tree = self.search(space, offsets, targets, weights, arrival, best - earliest)
+            if tree == -1:
+                break
+            remaining -= 1
+            if arrival[tree] + space.time[tree] < best:
+                best = arrival[tree] + space.time[tree]
+
+    def reverse_treemap(self, exits, space):
+        """
+        Function description: 
+        Prepares a search on the reversed treemap (Roads in the opposite direction), which is built once
+        in __init__, by seeding every exit tree in space with a time of 0. This stands in for an
+        additional Tree with a road of weight 0 to every exit, without copying the treemap.
+        :Input:
+            exits:  List of exit trees
+            space: The SearchSpace of the reverse search
+        Precondition: space is cleared
+        Postcondition: every exit which is a Tree of the TreeMap has a time of 0 in space and is in its heap
+                       (no road leads to the other exits, so they are left out)
+        Return: The reversed treemap as (reverse_offsets, reverse_targets, reverse_weights)
+        :Time complexity:  
+            Best & Worst case: O(E log E), where E is the number of exits
+        :Space complexity: 
+            Input space: O(E), where E is the number of exits
+            Aux space: O(1)
+        """
+        for exit in self._trees(exits):
+            space.seed(exit, 0)
+        return self.reverse_offsets, self.reverse_targets, self.reverse_weights
+
+    def search(self, space, offsets, targets, weights, goals=(), limit=float('inf')):
+        """
+        Function description: 
+        Dijkstra over the roads given in CSR form, continuing from the Trees in the heap of space.
+        Trees only enter the heap when they are first discovered. The search pauses after finalizing a Tree
+        in goals (it can be resumed by calling search again) and ends once the heap is empty or the next
+        time served is not below limit.
+        :Input:
+            space: SearchSpace holding the state of the search
+            offsets, targets, weights: The roads to search along (the TreeMap or the reversed TreeMap)
+            goals: container of Tree ids to pause at
+            limit: time from which the search ends
+        Postcondition: every Tree finalized so far has its shortest time and route in space
+        Return: the id of the goal Tree just finalized, or -1 if the search ended
+        :Time complexity:  
+            Best & Worst case: O((K+D) log K), where K are the Trees discovered and D the roads leaving the
+                               Trees finalized
+        :Space complexity: 
+            Input space: O(T+R)
+            Aux space: O(1), the state is kept in space
+        """
+        time, visited, previous, touched = space.time, space.visited, space.previous, space.touched
+        discovered = space.heap
+        infinity = float('inf')
+
+        while discovered.size > 0:
+            current = discovered.serve() #Serve min item from the heap
+            if not time[current] < limit:
+                return -1
+            visited[current] = True   #Time finalized for current
+
+            # Perform edge relaxation on all of the roads connected to the tree
+            for road in range(offsets[current], offsets[current + 1]):
+                v = targets[road]
+                new_time = time[current] + weights[road]
+
+                #If a shorter route is found (never true for a finalized tree, as weights are non-negative)
+                if new_time < time[v]:
+                    previous[v] = current
+                    if time[v] == infinity:
+                        #First time v is discovered
+                        touched.append(v)
+                        time[v] = new_time
+                        discovered.insert(new_time, v)
+                    elif visited[v]:
+                        #Only after a road changed (see repair_shorter()): v was finalized and is searched again
+                        visited[v] = False
+                        time[v] = new_time
+                        discovered.insert(new_time, v)
+                    else:
+                        time[v] = new_time
+                        discovered.update(new_time, v)   #Updating Tree v in heap as time[v] changed
+
+            if current in goals:
+                return current
+        return -1
+
+    def follow(self, previous, tree):
+        """
+        Function description: 
+        Lists the Trees from tree back to the start of its search by following the previous array
+        :Input:
+            previous: previous array of a SearchSpace after a search
+            tree: Tree id the route ends at
+        Return: List of Tree ids, beginning with tree
+        :Time complexity: O(P), where P is the length of the route
+        :Space complexity: O(P), where P is the length of the route
+        """
+        route = [tree]
+        while previous[tree] != -1:
+            tree = previous[tree]
+            route.append(tree)
+        return route
+    
+#Name under which load_module() registers this file as a module
+MODULE_NAME = "dijkstra_minheap"
+
+
+def load_module(path=None):
+    """
+    Loads Dijkstra&MinHeap.py (its name is not a valid module name, so it cannot be imported directly) as module
+    MODULE_NAME. The module is kept in sys.modules, so that its functions can be pickled by reference for the
+    workers of an EscapeExecutor; a module already loaded from the same path is reused.
+
+    Input:
+        path: path of the file to load, this file if None
+    Return:
+        The module
+
+    Time complexity: O(1) when the module is reused, the time to run the file otherwise
+    Space complexity: O(1) when the module is reused, the size of the module otherwise
+    """
+    if path is None:
+        path = __file__
+    loaded = sys.modules.get(MODULE_NAME)
+    if loaded is not None and os.path.abspath(loaded.__file__) == os.path.abspath(path):
+        return loaded
+    spec = importlib.util.spec_from_file_location(MODULE_NAME, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[MODULE_NAME] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        #A module which failed to run is not left half-initialized in sys.modules
+        del sys.modules[MODULE_NAME]
+        raise
+    return module
+
+
+#TreeMap of an EscapeExecutor worker process, and the shared memory it reads from
+_worker_tree_map = None
+_worker_memory = None
+
+
+def _attach_worker(name, layout, max_weight):
+    """
+    Initializer of the EscapeExecutor worker processes: builds the worker's TreeMap on the shared memory
+    block, without copying the forest
+
+    Input:
+        name: name of the shared memory block
+        layout: layout of the arrays in the block (see TreeMap.array_layout())
+        max_weight: largest road weight of the TreeMap
+    Time complexity: O(S), where S is the number of solulus
+    Space complexity: O(S)
+    """
+    global _worker_tree_map, _worker_memory
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    _worker_tree_map = TreeMap.from_buffer(_worker_memory.buf, layout, max_weight=max_weight)
+
+
+def _escape_chunk(queries):
+    """
+    Answers a chunk of (start, exits) queries in an EscapeExecutor worker process. escape_many() only pays off
+    when a start or a set of exits comes back, as its searches from the exits run without the arrival bound
+    of escape(), so a chunk of distinct queries is answered by escape() one query at a time.
+    Return: list of escape() answers, in the same order
+    """
+    starts = set(start for start, _ in queries)
+    exit_sets = set(frozenset(exits) for _, exits in queries)
+    if len(starts) == len(queries) and len(exit_sets) == len(queries):
+        return [_worker_tree_map.escape(start, exits) for start, exits in queries]
+    return _worker_tree_map.escape_many(queries)
+
+
+class EscapeExecutor:
+    """
+    Process pool answering escape queries in parallel. The arrays of the TreeMap are copied once into a
+    shared memory block, which every worker reads directly, so no query copies the forest.
+
+    The workers are forked, so the platform needs the fork start method (not available on Windows). The name of
+    this file is not a module name that spawned workers could import, and the tasks are pickled by reference to
+    this module, so it has to be in sys.modules (see load_module()).
+    """
+
+    def __init__(self, tree_map, processes=None, chunksize=None):
+        """
+        This init copies tree_map into shared memory and starts the worker processes
+
+        Input:
+            tree_map: the TreeMap to answer queries on
+            processes: number of worker processes, os.cpu_count() if None
+            chunksize: number of queries sent to a worker at a time, picked from the batch size if None
+        Time complexity: O(T+R+S), copying the arrays once
+        Space complexity: O(T+R+S), the shared memory block
+        """
+        if sys.modules.get(__name__) is None:
+            raise RuntimeError("EscapeExecutor needs module {!r} in sys.modules, load it with "
+                               "load_module()".format(__name__))
+        #Raises ValueError where processes cannot be forked
+        context = multiprocessing.get_context('fork')
+        #The workers cannot tell free slots from roads
+        tree_map = tree_map.compacted()
+        layout, size = tree_map.array_layout()
+        self.memory = shared_memory.SharedMemory(create=True, size=max(size, 8))
+        try:
+            tree_map.write_arrays(self.memory.buf, layout)
+            self.processes = processes or os.cpu_count() or 1
+            self.chunksize = chunksize
+            self.pool = context.Pool(self.processes, initializer=_attach_worker,
+                                     initargs=(self.memory.name, layout, tree_map.max_weight))
+        except BaseException:
+            #The block would outlive this process otherwise
+            self.memory.close()
+            self.memory.unlink()
+            raise
+
+    def map(self, queries):
+        """
+        Answers every (start, exits) query on the worker processes
+
+        Input:
+            queries: iterable of (start, exits) pairs
+        Return:
+            List with the answer of escape() for every query, in submission order
+
+        Time complexity: O(Q/P) escape queries per worker, where Q is the number of queries and P of processes
+        Space complexity: O(Q)
+        """
+        queries = [(start, list(exits)) for start, exits in queries]
+        chunksize = self.chunksize or max(1, -(-len(queries) // (4 * self.processes)))
+        chunks = [queries[i:i + chunksize] for i in range(0, len(queries), chunksize)]
+        answers = []
+        for chunk in self.pool.map(_escape_chunk, chunks):
+            answers.extend(chunk)
+        return answers
+
+    def close(self):
+        """
+        Stops the worker processes and frees the shared memory block
+        """
+        self.pool.close()
+        self.pool.join()
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EscapeService:
+    """
+    asyncio front end answering escape queries off the event loop. Requests wait in a bounded queue, which holds
+    callers back once max_pending are waiting. A single task gathers them into micro-batches of up to batch_size
+    requests, waiting at most batch_window seconds after the first one, orders each batch so that requests with the
+    same exits and the same start are next to each other, and answers it with TreeMap.escape_many() (or
+    EscapeExecutor.map()) on a thread of its own. Batches run one at a time, as the pools and cache of a TreeMap
+    are not shared between threads. The searches of a TreeMap still share the GIL with the event loop, those of an
+    EscapeExecutor run in other processes.
+
+    Used in process as:
+        async with EscapeService(tree_map) as service:
+            answer = await service.escape(start, exits)
+    """
+
+    def __init__(self, tree_map, executor=None, batch_size=64, batch_window=0.002, max_pending=1024, heap=None):
+        """
+        This init sets up the service, the batching task starts with start() or the first request
+
+        Input:
+            tree_map: the TreeMap to answer queries on
+            executor: EscapeExecutor to answer the batches on, the batches run on tree_map if None
+            batch_size: largest number of requests answered together
+            batch_window: seconds a batch waits for more requests after its first one
+            max_pending: number of requests which can wait before escape() holds callers back
+            heap: priority queue backend of the searches (see TreeMap.escape())
+        Complexity(Space and time): O(1)
+        """
+        self.tree_map = tree_map
+        self.executor = executor
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.heap = heap
+        self.queue = asyncio.Queue(max_pending)
+        self.task = None
+        self.thread = None
+        self.closed = False
+        #Number of batches answered so far
+        self.batches = 0
+
+    async def start(self):
+        """
+        Starts the batching task on the running event loop, if it is not running yet
+        """
+        if self.closed:
+            raise RuntimeError("EscapeService is closed")
+        if self.task is None:
+            self.thread = ThreadPoolExecutor(1)
+            self.task = asyncio.get_running_loop().create_task(self.serve())
+
+    async def escape(self, start, exits):
+        """
+        Queues a query and waits for its answer, holding the caller back while the queue is full
+
+        Input:
+            start: id of starting tree
+            exits: id of exit trees
+        Return:
+            None (If no route) or (total_time, route), as returned by TreeMap.escape()
+
+        Time complexity: the batch window, plus the time to answer the batch it joins
+        Space complexity: O(E), where E is the number of exits
+        """
+        await self.start()
+        answer = asyncio.get_running_loop().create_future()
+        await self.queue.put((start, frozenset(exits), answer))
+        return await answer
+
+    async def serve(self):
+        """
+        Batching task: gathers the queued requests into batches and answers them until close() is called
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            request = await self.queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = loop.time() + self.batch_window
+            stop = False
+            while len(batch) < self.batch_size:
+                if self.queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        request = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    request = self.queue.get_nowait()
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+            await self.answer(batch)
+            if stop:
+                return
+
+    async def answer(self, batch):
+        """
+        Answers a batch of requests on the service's thread and hands every caller its answer. If the batch
+        fails, its requests are answered one at a time so that only the failing ones get the exception.
+
+        Input:
+            batch: list of (start, frozenset of exits, future) requests
+        Time complexity: the complexity of TreeMap.escape_many() on the batch
+        Space complexity: O(B), where B is the number of requests in the batch
+        """
+        #Callers which stopped waiting are not answered
+        batch = [request for request in batch if not request[2].done()]
+        if len(batch) == 0:
+            return
+        #Requests with the same exits, then with the same start, are answered one after another
+        groups = {}
+        for request in batch:
+            groups.setdefault(request[1], []).append(request)
+        batch = [request for group in groups.values() for request in sorted(group, key=lambda request: request[0])]
+
+        loop = asyncio.get_running_loop()
+        queries = [(start, exits) for start, exits, _ in batch]
+        self.batches += 1
+        try:
+            answers = await loop.run_in_executor(self.thread, self.run, queries)
+        except Exception:
+            for start, exits, future in batch:
+                try:
+                    answer = await loop.run_in_executor(self.thread, self.run, [(start, exits)])
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+                else:
+                    if not future.done():
+                        future.set_result(answer[0])
+            return
+        for (_, _, future), answer in zip(batch, answers):
+            if not future.done():
+                future.set_result(answer)
+
+    def run(self, queries):
+        """
+        Answers a list of (start, exits) queries, on the service's thread
+        Return: list of escape() answers, in the same order
+        """
+        if self.executor is not None:
+            return self.executor.map(queries)
+        return self.tree_map.escape_many(queries, self.heap)
+
+    async def close(self):
+        """
+        Stops taking requests, answers the ones already queued and stops the batching task and its thread
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.task is not None:
+            await self.queue.put(None)
+            await self.task
+            self.thread.shutdown()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+#Average number of roads per Tree left at which ContractionHierarchy stops contracting (see its core)
+CORE_DEGREE = 8
+#Largest number of roads a witness search of ContractionHierarchy scans
+WITNESS_ROADS = 300
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over the roads of a TreeMap, answering escape queries with two small upward searches.
+
+    Trees are contracted one at a time, least important first: a contracted Tree is taken out of the forest and
+    a shortcut road replaces every shortest route that went through it. Every Tree gets the rank of its
+    contraction, and every shortest route is then a climb to a peak followed by a descent from it.
+    The searches to every solulu and from every teleport target are run when the hierarchy is built and kept
+    as buckets on the Trees they reach, so a query only searches upward from the start and from the exits.
+
+    Contraction stops once the Trees left have more than core_degree roads each on average: on dense forests every
+    contraction adds more shortcuts than it removes roads. The Trees left form the core, which the queries search
+    through as plain Dijkstra, so the hierarchy pays off on sparse, road-like forests.
+
+    The hierarchy is a snapshot of the TreeMap: after a road or solulu changes, escape() raises RuntimeError
+    until the hierarchy is built again.
+    """
+
+    def __init__(self, tree_map, witness_limit=64, core_degree=CORE_DEGREE):
+        """
+        This init contracts every Tree of tree_map and builds the buckets of the solulus and teleport targets
+
+        Input:
+            tree_map: the TreeMap to answer queries on
+            witness_limit: largest number of Trees finalized by a search for a route avoiding the Tree being
+                           contracted; a larger limit finds more such routes and so adds fewer shortcuts
+            core_degree: average number of roads per Tree left at which contraction stops, None to contract
+                         every Tree
+        Time complexity: O(T*D*D*W log W) for the contraction, where W is witness_limit and D the largest number
+                         of roads of a Tree while it is contracted, plus one upward search per solulu and target
+        Space complexity: O(T+R+C), where C is the number of shortcuts
+        """
+        self.tree_map = tree_map
+        self.changes = tree_map.changes
+        self.witness_limit = witness_limit
+        n = len(tree_map.offsets) - 1
+        infinity = float('inf')
+
+        #Roads of the Trees not contracted yet, keeping the shortest of parallel roads: out[u][v] = in[v][u] = w
+        out = [{} for _ in range(n)]
+        into = [{} for _ in range(n)]
+        for u in range(n):
+            for road in range(tree_map.offsets[u], tree_map.offsets[u + 1]):
+                v, w = tree_map.targets[road], tree_map.weights[road]
+                if v != u and w < out[u].get(v, infinity):
+                    out[u][v] = w
+                    into[v][u] = w
+        #Tree skipped by each shortcut (u, v), so that it can be unpacked into the roads it replaces
+        self.middle = {}
+
+        #Contracting the Tree with the lowest priority first. Priorities go stale as the forest shrinks, so a
+        #served priority is refreshed, and its Tree waits again if it is no longer the lowest.
+        self.rank = array('q', [-1]) * n
+        contracted_neighbours = [0] * n
+        #Every road through a Tree with many roads is taken to need a shortcut rather than searching for witnesses,
+        #the slowest searches, as its priority is refreshed when served anyway
+        queue = []
+        for v in range(n):
+            added = len(into[v]) * len(out[v])
+            if added <= witness_limit:
+                added = len(self._shortcuts(out, into, v))
+            queue.append((self._priority(out, into, v, added, contracted_neighbours), v))
+        heapq.heapify(queue)
+        up, down = [[] for _ in range(n)], [[] for _ in range(n)]
+        order = 0
+        roads = sum(len(tree_roads) for tree_roads in out)
+        while len(queue) > 0:
+            priority, v = heapq.heappop(queue)
+            #Contracting a dense forest adds shortcuts faster than it removes Trees, the rest is left as the core
+            if core_degree is not None and roads > core_degree * (len(queue) + 1):
+                heapq.heappush(queue, (priority, v))
+                break
+            shortcuts = self._shortcuts(out, into, v)
+            priority = self._priority(out, into, v, len(shortcuts), contracted_neighbours)
+            if len(queue) > 0 and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, v))
+                continue
+
+            self.rank[v] = order
+            order += 1
+            roads -= len(out[v]) + len(into[v])
+            for u, x, w in shortcuts:
+                if w < out[u].get(x, infinity):
+                    roads += x not in out[u]
+                    out[u][x] = w
+                    into[x][u] = w
+                    self.middle[(u, x)] = v
+            #Roads left at v all lead to Trees of higher rank: up from v, or down into v
+            up[v] = list(out[v].items())
+            down[v] = list(into[v].items())
+            for x in out[v]:
+                del into[x][v]
+                contracted_neighbours[x] += 1
+            for u in into[v]:
+                del out[u][v]
+                contracted_neighbours[u] += 1
+            out[v], into[v] = None, None
+
+        #The Trees of the core share the highest rank, and their roads between each other are both upward and
+        #downward, so the searches up the hierarchy go on through the core as plain Dijkstra
+        self.core = [v for _, v in queue]
+        self.core_rank = order
+        for v in self.core:
+            self.rank[v] = order
+            up[v] = list(out[v].items())
+            down[v] = list(into[v].items())
+
+        #Upward roads in CSR form, and the downward roads reversed (from the lower Tree to the higher one)
+        self.up_offsets, self.up_targets, self.up_weights = self._csr(up, tree_map.weights)
+        self.down_offsets, self.down_targets, self.down_weights = self._csr(down, tree_map.weights)
+        #The searches of the buckets stop at the core: a route through the core leaves it at its last Tree of the
+        #core for good, and the query searches through the core up to there
+        for v in self.core:
+            up[v], down[v] = [], []
+        fill_up = self._csr(up, tree_map.weights)
+        fill_down = self._csr(down, tree_map.weights)
+        del up, down, out, into
+
+        #Bucket of every Tree reached by the search down to a solulu (k, time from the Tree to solulu k),
+        #and by the search up from a teleport target (target, time from the target to the Tree)
+        #(the solulus and teleport targets which are not Trees cannot be reached and have no bucket)
+        self.solulu_buckets, self.solulu_previous = {}, []
+        for k in range(len(tree_map.solulu_ids)):
+            if tree_map.solulu_ids[k] in tree_map._solulu_trees:
+                self.solulu_previous.append(self._fill(self.solulu_buckets, k, tree_map.solulu_ids[k], fill_down))
+            else:
+                self.solulu_previous.append(None)
+        self.teleport_buckets, self.teleport_previous = {}, {}
+        for target in tree_map._teleport_targets:
+            self.teleport_previous[target] = self._fill(self.teleport_buckets, target, target, fill_up)
+
+    def _priority(self, out, into, v, added, contracted_neighbours):
+        """
+        Importance of Tree v: twice the shortcuts its contraction adds less the roads it removes, plus the number
+        of its neighbours contracted already (which spreads the contractions over the forest)
+        Input:
+            added: number of shortcuts needed to contract v (see _shortcuts())
+        Complexity(Space and time): O(1)
+        """
+        return 2 * (added - len(out[v]) - len(into[v])) + contracted_neighbours[v]
+
+    def _shortcuts(self, out, into, v):
+        """
+        Shortcuts needed to contract Tree v: (u, x, w) for every road u -> v -> x without a route from u to x of
+        at most w that avoids v, as found by a search of at most witness_limit Trees and WITNESS_ROADS roads from u
+        Time complexity: O(D*W*D log W), where D is the number of roads of v and W is witness_limit
+        Space complexity: O(D*D + W)
+        """
+        shortcuts = []
+        infinity = float('inf')
+        for u, to_v in into[v].items():
+            if len(out[v]) == 0:
+                break
+            #The search ends past the longest route through v, or once every Tree after v is finalized
+            limit = to_v + max(out[v].values())
+            remaining = len(out[v]) - (u in out[v])
+            time = {u: 0}
+            queue = [(0, u)]
+            #Trees with many roads would make a search of witness_limit Trees scan most of the forest, so the
+            #roads it scans are bounded too
+            finalized = scanned = 0
+            while len(queue) > 0 and finalized < self.witness_limit and scanned < WITNESS_ROADS and remaining > 0:
+                t, a = heapq.heappop(queue)
+                if t > time[a]:
+                    continue
+                if t > limit:
+                    break
+                finalized += 1
+                if a in out[v] and a != u:
+                    remaining -= 1
+                scanned += len(out[a])
+                #Only routes within the limit can make a shortcut unneeded
+                for b, w in out[a].items():
+                    if b != v and t + w <= limit and t + w < time.get(b, infinity):
+                        time[b] = t + w
+                        heapq.heappush(queue, (t + w, b))
+            for x, from_v in out[v].items():
+                if x != u and min(time.get(x, infinity), out[u].get(x, infinity)) > to_v + from_v:
+                    shortcuts.append((u, x, to_v + from_v))
+        return shortcuts
+
+    def _csr(self, roads, weights):
+        """
+        Lays out lists of (target, weight) roads per Tree in CSR form, with the typecode of weights
+        Complexity(Space and time): O(T+R+C)
+        """
+        offsets = array('q', [0])
+        targets = array('q')
+        csr_weights = array(_typecode(weights))
+        for tree_roads in roads:
+            for v, w in tree_roads:
+                targets.append(v)
+                csr_weights.append(w)
+            offsets.append(len(targets))
+        return offsets, targets, csr_weights
+
+    def _fill(self, buckets, key, tree, roads):
+        """
+        Searches up the hierarchy from tree, along the reversed downward roads (times to tree) or along the upward
+        roads (times from tree), and adds (key, time) to the bucket of every Tree reached
+        Input:
+            roads: (offsets, targets, weights) to search along, without the roads of the Trees of the core
+        Return: dictionary of Tree -> previous Tree of the search, -1 for tree
+        Time complexity: O(K log K), where K is the number of Trees reached
+        """
+        space = self.tree_map.acquire_space("binary")
+        try:
+            space.seed(tree, 0)
+            self.tree_map.search(space, *roads)
+            previous = {}
+            for reached in space.touched:
+                buckets.setdefault(reached, []).append((key, space.time[reached]))
+                previous[reached] = space.previous[reached]
+            return previous
+        finally:
+            self.tree_map.release_space(space)
+
+    def escape(self, start, exits):
+        """
+        Finds the shortest time and route with the given start and exits, as TreeMap.escape().
+        The search up from start meets the buckets of the solulus, and the search up from every exit at once
+        (along the reversed downward roads) meets the buckets of the teleport targets. As in TreeMap.escape(),
+        the first search stops once no Tree left can bring any solulu closer, and the second once no Tree left
+        can give a shorter total.
+
+        Input:
+            start: id of starting tree
+            exits: id of exit trees
+        Return:
+            None (If no route) or (total_time, route)
+
+        Time complexity: O(K log K + B + S + P), where K is the number of Trees reached by both upward searches,
+                         B the size of their buckets and P the length of the route
+        Space complexity: O(T), the SearchSpaces of both searches
+        """
+        tree_map = self.tree_map
+        if tree_map.changes != self.changes:
+            raise RuntimeError("The TreeMap changed after the ContractionHierarchy was built, build it again")
+        infinity = float('inf')
+        forward = tree_map.acquire_space("binary")
+        backward = tree_map.acquire_space("binary")
+        try:
+            tree_map._check_start(start)
+            forward.seed(start, 0)
+
+            #Best time to every solulu, with its peak. A Tree served later only brings a solulu closer if its time
+            #is below the best one, so the search stops once it is past the best time of every solulu.
+            to_solulu = [(infinity, -1)] * len(tree_map.solulu_ids)
+            solulu_buckets = self.solulu_buckets
+            #Number of solulus with a bucket not met yet, and an upper bound of the largest best time once they all
+            #are, which is only worked out again when the search is past it
+            waiting = [sum(1 for previous in self.solulu_previous if previous is not None)]
+            latest = [infinity]
+
+            def meet_solulus(tree, time):
+                for k, bucket_time in solulu_buckets.get(tree, ()):
+                    if time + bucket_time < to_solulu[k][0]:
+                        if to_solulu[k][0] == infinity:
+                            waiting[0] -= 1
+                        to_solulu[k] = (time + bucket_time, tree)
+                if waiting[0] == 0 and (latest[0] == infinity or time >= latest[0]):
+                    latest[0] = max(total for total, _ in to_solulu if total != infinity)
+                return latest[0]
+
+            if len(tree_map._solulu_trees) > 0:
+                self._upward(forward, (self.up_offsets, self.up_targets, self.up_weights),
+                             (self.down_offsets, self.down_targets, self.down_weights), meet_solulus)
+
+            #Earliest time each teleport target can be reached from start (after clawing)
+            arrival = {}
+            for k in range(len(tree_map.solulu_ids)):
+                target = tree_map.teleport_to[k]
+                if to_solulu[k][0] + tree_map.claw_times[k] < arrival.get(target, infinity):
+                    arrival[target] = to_solulu[k][0] + tree_map.claw_times[k]
+            if len(arrival) == 0:
+                return None
+
+            #Time to the nearest exit from every teleport target, with its peak. Every total is at least the
+            #earliest arrival plus the time served, so the search stops once that is not below the best total.
+            to_exit = {}
+            teleport_buckets = self.teleport_buckets
+            earliest = min(arrival.values())
+            best = [infinity]
+
+            def meet_teleports(tree, time):
+                for target, bucket_time in teleport_buckets.get(tree, ()):
+                    if target in arrival and time + bucket_time < to_exit.get(target, (infinity, -1))[0]:
+                        to_exit[target] = (time + bucket_time, tree)
+                        if arrival[target] + time + bucket_time < best[0]:
+                            best[0] = arrival[target] + time + bucket_time
+                return best[0] - earliest
+
+            for exit in tree_map._trees(exits):
+                backward.seed(exit, 0)
+            self._upward(backward, (self.down_offsets, self.down_targets, self.down_weights),
+                         (self.up_offsets, self.up_targets, self.up_weights), meet_teleports)
+
+            shortest, index = infinity, -1
+            for k in range(len(tree_map.solulu_ids)):
+                total = to_solulu[k][0] + tree_map.claw_times[k] + to_exit.get(tree_map.teleport_to[k], (infinity,))[0]
+                if total < shortest:
+                    shortest, index = total, k
+            if shortest == infinity:
+                return None
+
+            solulu, target = tree_map.solulu_ids[index], tree_map.teleport_to[index]
+            #start up to the peak, down to the solulu
+            peak = to_solulu[index][1]
+            climb = tree_map.follow(forward.previous, peak)
+            climb.reverse()
+            route = self._unpack(climb + tree_map.follow(self.solulu_previous[index], peak)[1:])
+            #teleport target up to the peak, down to an exit
+            peak = to_exit[target][1]
+            climb = tree_map.follow(self.teleport_previous[target], peak)
+            climb.reverse()
+            rest = self._unpack(climb + tree_map.follow(backward.previous, peak)[1:])
+            #A solulu teleporting to itself is only listed once
+            if target == solulu:
+                rest.pop(0)
+            return shortest, route + rest
+        finally:
+            tree_map.release_space(forward)
+            tree_map.release_space(backward)
+
+    def _upward(self, space, roads, stall_roads, meet):
+        """
+        Dijkstra up the hierarchy from the Trees in the heap of space, with stall-on-demand: a Tree which a Tree of
+        higher rank reaches sooner through one of stall_roads does not lie on a shortest route, so its roads are
+        not followed. Such a Tree keeps a time which is too long, which never gives a shorter total.
+        The Trees of the core are never stalled, as the search follows the roads between them both ways.
+
+        Input:
+            space: SearchSpace holding the state of the search
+            roads: (offsets, targets, weights) to search along, every road going to a Tree of higher rank
+            stall_roads: the roads coming down into every Tree from Trees of higher rank, reversed
+            meet: function called with every Tree served and not stalled and its time, returning the time from
+                  which the search ends
+        Time complexity: O((K+D) log K), where K is the number of Trees discovered and D their roads
+        Space complexity: O(1), the state is kept in space
+        """
+        time, visited, previous, touched = space.time, space.visited, space.previous, space.touched
+        discovered = space.heap
+        offsets, targets, weights = roads
+        stall_offsets, stall_targets, stall_weights = stall_roads
+        rank, core_rank = self.rank, self.core_rank
+        infinity = float('inf')
+        while discovered.size > 0:
+            current = discovered.serve()
+            visited[current] = True
+            stalled = False
+            if rank[current] != core_rank:
+                for road in range(stall_offsets[current], stall_offsets[current + 1]):
+                    if time[stall_targets[road]] + stall_weights[road] < time[current]:
+                        stalled = True
+                        break
+            if stalled:
+                continue
+            if time[current] >= meet(current, time[current]):
+                break
+            for road in range(offsets[current], offsets[current + 1]):
+                v = targets[road]
+                new_time = time[current] + weights[road]
+                if new_time < time[v]:
+                    previous[v] = current
+                    if time[v] == infinity:
+                        touched.append(v)
+                        time[v] = new_time
+                        discovered.insert(new_time, v)
+                    else:
+                        time[v] = new_time
+                        discovered.update(new_time, v)
+
+    def _unpack(self, trees):
+        """
+        Replaces every shortcut between consecutive Trees of trees by the roads it stands for
+        Return: List of Tree ids in which consecutive Trees are joined by a road of the TreeMap
+        Time complexity: O(P), where P is the length of the unpacked route
+        Space complexity: O(P)
+        """
+        route = [trees[0]]
+        for k in range(len(trees) - 1):
+            pending = [(trees[k], trees[k + 1])]
+            while len(pending) > 0:
+                u, v = pending.pop()
+                middle = self.middle.get((u, v))
+                if middle is None:
+                    route.append(v)
+                else:
+                    pending.append((middle, v))
+                    pending.append((u, middle))
+        return route
+
+
+class SearchSpace:
+    """
+    Per query state of a Dijkstra search over a TreeMap (time, visited and previous of every Tree,
+    plus the MinHeap), kept apart from the Trees and Roads so that the TreeMap is never changed by a query.
+    A SearchSpace remembers which Trees it discovered so it can be cleared and reused without
+    reallocating its arrays.
+    """
 
-        :Space complexity:
-        :Input space: O(T), where T is the length of route/ reversed_route/ exits & final_routes individually
-        :Aux space: O(1), No additional space used
+    __slots__ = ('time', 'visited', 'previous', 'heap', 'touched')
 
+    def __init__(self, size, heap=None):
         """
+        This init initializes a SearchSpace in which every Tree is undiscovered
+        Input:
+            size: number of Tree ids the SearchSpace can hold
+            heap: empty priority queue for Tree ids below size, a new MinHeap if None
 
-        #Combining the two routes together into final_routes (With the following condition)
-        #Provided that the id of the tree in the reversed graph is the same as the teleport_to of the tree in the original graph
-        for i in range(len(route)):
-            #Adds claw_time into the time if the tree is a solulu
-            if self.adjacency_list[route[i][1]].solulu == True:
-                    route[i][0] += self.adjacency_list[route[i][1]].claw_time
-            #The condition for combining
-            for j in range(len(reversed_route)):
-                if reversed_route[j][1].id == self.adjacency_list[route[i][1]].teleport_to:
-                    route[i].append(reversed_route[j][1])
-                    final_routes.append(route[i])
-
+        Pre-condition: size is a positive integer
+        Post-condition: time is infinity, visited is False and previous is -1 for every Tree
+        Time complexity: O(size)
+        Space complexity: O(size)
+        """
+        self.time = [float('inf')] * size
+        self.visited = bytearray(size)
+        self.previous = array('q', [-1]) * size
+        self.heap = heap if heap is not None else MinHeap(size)
+        #Trees whose time is no longer infinity
+        self.touched = []
+
+    def seed(self, tree, time):
+        """
+        Discovers tree with the given time and inserts it into the heap, unless it was already discovered
+        Input:
+            tree: Tree id a search starts from
+            time: start time of tree
+        Complexity(Space and time): O(log n), where n is the number of items in the heap
+        """
+        if self.time[tree] == float('inf'):
+            self.discover(tree, time)
+            self.heap.insert(time, tree)
 
-        #Adding the time to the exit tree from start for all of the possible paths
-        for i in range(len(final_routes)):
-            if final_routes[i][2].id in exits:  #If the tree is an exit tree, then no need to add more time
-                final_routes[i].append(final_routes[i][0])  #Appending into the third index of final_routes[i]
-            else:
-                final_routes[i].append(final_routes[i][0] + final_routes[i][2].time) #Appending into the third index of final_routes[i]
-        
-        #Proceeds to find the minimum time and the index of the minimum time among the final_routes
-        min = float('inf')
-        index = 0
-        for i in range(len(final_routes)):
-            if final_routes[i][3] < min:
-                min = final_routes[i][3]
-                index = i
-        # Returns the minimum and the index that it could be found at
-        return min, index
-        
+    def discover(self, tree, time):
+        """
+        Sets the time of tree, remembering tree if it had not been discovered before
+        Input:
+            tree: Tree id
+            time: new time of tree
+        Complexity(Space and time): O(1)
+        """
+        if self.time[tree] == float('inf'):
+            self.touched.append(tree)
+        self.time[tree] = time
 
-    
-    
-    def reverse_treemap(self, treemap, exits):
+    def reset(self):
         """
-        Function description: 
-        Reverses treemap provided in the input (Reverses the direction of edges) and adds a new vertex
-        which has an edge to all exit trees
-        (Function also calls the reset method on all Trees to reset certain attributes to their default values)
-        :Input:
-            treemap: The treemap to be reversed
-            exits:  List of exit trees
-        Precondition: treemap is the adjacency list of the TreeMap before reversing
-        Postcondition: new_adjacency_list is the reversed treemap where each road is reversed and an additional Tree
-        Return: The reversed treemap
-        :Time complexity:  
-            Best & Worst case: O(T+R)
-            :Time complexity analysis: Iterating through every road in a Tree for each Trees in adjacency_list
-        :Space complexity: 
-            Input space: O(T+R), where T & R are the Trees & Roads in adjacency_list
-            Aux space: O(R), where R is the number of roads in treemap
-        :Space complexity analysis: Adding all roads to a list new_roads
+        Sets every discovered Tree back to its default values and empties the heap
+        Time-Complexity(Best and worst-case): O(K), where K is the number of discovered Trees
+        Space-Complexity(Input and aux): O(1)
         """
-        #List to keep track of the new roads (Reversed roads from the original treemap)
-        new_roads = []
-        new_adjacency_list = treemap  #Copying the treemap
-        
-        #Reverses the direction of all roads in each tree and adds them to new_roads
-        for tree in new_adjacency_list:
-            for i in range(len(tree.roads)):
-                new_road = Road(tree.roads[i].v, tree.roads[i].u, tree.roads[i].w)
-                new_roads.append(new_road)
-    
-        #Resets all the trees in the new_adjacency_list
-        for tree in new_adjacency_list:
-            tree.reset()
-
-       #Adds the reversed roads to the correct tree in new_adjacency_list
-        for tree in new_adjacency_list:
-            for i in range(len(new_roads)):
-                if tree.id == new_roads[i].u:
-                    tree.add_road(new_roads[i])
-
-        #Adds a new tree to the adjacency list with roads to all exit trees
-        self.adjacency_list.append(Tree(self.max+1))
-        for i in range(1, len(self.adjacency_list)):
-            if self.adjacency_list[i].id in exits:
-                self.adjacency_list[self.max+1].add_road(Road(self.max+1, self.adjacency_list[i].id, 0))
-
-        return new_adjacency_list
-    
+        for tree in self.touched:
+            self.time[tree] = float('inf')
+            self.visited[tree] = False
+            self.previous[tree] = -1
+        self.touched.clear()
+        self.heap.clear()
+
+
 class Tree:
+    """
+    View of a Tree of a TreeMap (see TreeMap.tree()). Its attributes are slots rather than a __dict__, so a
+    view takes TREE_VIEW_BYTES plus its list of Roads.
+    """
+
+    __slots__ = ('id', 'roads', 'solulu', 'claw_time', 'teleport_to')
+
     def __init__(self, id):
         """
         This init initializes a Tree object
@@ -356,10 +2648,6 @@ class Tree:
         self.solulu = False   #Indicates if a Tree is a solulu
         self.claw_time = 0    #claw_time if Tree is a solulu
         self.teleport_to = None   #Tree to teleport after clawing
-        self.time = float('inf')
-        self.visited = False
-        self.discovered = False
-        self.previous = None
        
 
     def add_road(self, road):
@@ -372,28 +2660,16 @@ class Tree:
         Complexity(Space and time): O(1)  
         """
         self.roads.append(road)
-    
-
-    def reset(self):
-        """
-        Resets the selected Tree object's attributes to their default values
-        Complexity(Space and time): O(1)
-        Pre-condition: Existing Tree objects
-        Post-condition: Listed attributes are to set to their default values
-        Time-Complexity(Best and worst-case): O(1)  
-        Space-Complexity(Input and aux): O(1)
-        """
-        self.time = float('inf')
-        self.visited = False
-        self.discovered = False
-        self.previous = None
-        self.roads = []
 
 
 class Road:
     """
-    A Road object (u, v, w) which links Tree u to Tree v with a weight of w
+    A Road object (u, v, w) which links Tree u to Tree v with a weight of w.
+    Its attributes are slots rather than a __dict__, so a Road takes ROAD_VIEW_BYTES.
     """
+
+    __slots__ = ('u', 'v', 'w')
+
     def __init__(self, u, v, w):
        """
        This init function initializes a Road object which is used to determine if there
@@ -414,91 +2690,91 @@ class Road:
 
 
 class MinHeap:
+    """
+    Binary MinHeap of Tree ids ordered by time. The times and Tree ids are kept in two parallel
+    arrays (1-indexed) so that no list is allocated per item.
+
+    Every priority queue backend (MinHeap, DaryHeap, PairingHeap, LazyHeap) has the same interface:
+    insert(time, tree), serve(), update(time, tree), clear() and a size attribute.
+    None of the operations allocate: items move between preallocated slots.
+    """
+
+    __slots__ = ('keys', 'heap', 'indexes', 'size')
+
     def __init__(self, max_size):
         """
         This init initializes an instance of this MinHeap class
         Input:
-            max_size: an integer representing the length of the MinHeap
+            max_size: an integer representing the length of the MinHeap (Tree ids are below max_size)
 
         Pre-condition: max_size is a non-negative integer
-        Post-condition: heap and index are lists of length (max_size +1)
+        Post-condition: keys, heap and indexes are arrays of length (max_size +1)
         
-        Time complexity: O(max_size), making a list of size (max_size +1)
-        Space complexity: O(max_size), making a list of size (max_size +1)
+        Time complexity: O(max_size), making arrays of size (max_size +1)
+        Space complexity: O(max_size), making arrays of size (max_size +1)
         """
-        self.heap = [None] * (max_size + 1)
+        # self.keys[i] is the time of the Tree self.heap[i]
+        self.keys = [None] * (max_size + 1)
+        self.heap = array('q', [0]) * (max_size + 1)
 
          # self.indexes contains the position of Trees in the heap
          # Helps us keep track of the positions of the Trees in self.heap
          # Allows us to access items in the heap in O(1) time
-        self.indexes = [None] * (max_size + 1)  
+        self.indexes = array('q', [0]) * (max_size + 1)
         self.size = 0
 
     def insert(self, time, tree):
         """
-        Inserts the [time, tree] list into the correct position in the heap
+        Inserts tree with the given time into the correct position in the heap
     
         Input: 
             time: time taken to tree
-            tree: Tree object
+            tree: Tree id
 
-        Pre-condition: time is a non-negative integer and tree is a Tree object and self.size < len(self.heap)
-        Post-condition: [time, tree] has been inserted in the heap at index self.size
+        Pre-condition: time is a non-negative number, tree is a Tree id not in the heap and self.size < max_size
+        Post-condition: tree has been inserted in the heap
 
         Time-Complexity: O(log n), where n is the number of items in the heap
         Space-Complexity: 
             Input space: O(1), inputs are constant space
             Aux space: O(1), no extra space required
         """
-        if self.size >= len(self.heap):
+        if self.size + 1 >= len(self.heap):
             raise Exception("Heap is full")
         self.size += 1
-        self.heap[self.size] = [time, tree]
-        self.indexes[tree.id] = self.size
+        self.keys[self.size] = time
+        self.heap[self.size] = tree
+        self.indexes[tree] = self.size
         self.rise(self.size)
 
-    def size(self):
-        """
-        Returns the number of items in the heap
-        Complexity (Space and Time): O(1)
-        """
-        return self.size
-    
     def rise(self, i):
         """
-        Rise element at index i to its correct position
+        Rise element at index i to its correct position, moving its parents down instead of swapping
         input:
             i: index of element to rise
-        Pre-condition: i is a non-negative integer and 1 <= i <= self.length
+        Pre-condition: i is a non-negative integer and 1 <= i <= self.size
         Post-condition: Item at index i in the heap is in its rightful position
         Complexity: 
             Time-Complexity: O(log n), where n is the number of items in the heap
             Space-Complexity:
                 Input and Aux: O(1)
         """
-        while i > 1 and self.heap[i][1].time < self.heap[i//2][1].time:
-            self.swap_elements(i, i//2)
-            i = i//2
-    
-    def swap_elements(self, i, j):
-        """
-        Swaps the position of elements in the heap and indexes
-        input:
-            i: index of first item to be swapped
-            j: index of second item to be swapped
-        Pre-condition: i and j is a non-negative integer
-        Post-condition: Item at index i and j in the heap have swapped positions
-        Complexity(Space & Time): O(1), assignation are constant operations
-        """
-        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
-        self.indexes[self.heap[i][1].id], self.indexes[self.heap[j][1].id] = i, j
+        keys, heap, indexes = self.keys, self.heap, self.indexes
+        time, tree = keys[i], heap[i]
+        while i > 1 and time < keys[i // 2]:
+            parent = i // 2
+            keys[i], heap[i] = keys[parent], heap[parent]
+            indexes[heap[i]] = i
+            i = parent
+        keys[i], heap[i] = time, tree
+        indexes[tree] = i
 
     def sink(self, i):
         """
-        Sink element at index i to its correct position
+        Sink element at index i to its correct position, moving its smaller children up instead of swapping
         input:
             i: index of item to sink
-        Pre-condition: i is a non-negative integer and 1 <= i <= self.length
+        Pre-condition: i is a non-negative integer and 1 <= i <= self.size
         Post-condition: Item at index i in the heap is in its rightful position
         Complexity: 
             Time-complexity: O(log n)
@@ -506,46 +2782,569 @@ class MinHeap:
                 Input: O(1), input is a integer
                 Space: O(1), no extra space needed
         """
-        while 2*i <= self.size:
+        keys, heap, indexes, size = self.keys, self.heap, self.indexes, self.size
+        time, tree = keys[i], heap[i]
+        while 2*i <= size:
             j = 2*i
-            if j < self.size and self.heap[j][1].time > self.heap[j+1][1].time:
+            if j < size and keys[j] > keys[j+1]:
                 j += 1
-            if not (j <= self.size and self.heap[j][1].time < self.heap[i][1].time):
+            if not keys[j] < time:
                 break
-            self.swap_elements(i, j)
+            keys[i], heap[i] = keys[j], heap[j]
+            indexes[heap[i]] = i
             i = j
-
+        keys[i], heap[i] = time, tree
+        indexes[tree] = i
 
     def serve(self):
         """
-        Remove and return the minimum elemment from the heap
+        Remove and return the Tree id of the minimum elemment from the heap
         Complexity: 
             Time-complexity: O(log n), where n is the number of items in the heap
             Space-Complexity: O(1), No extra space 
         """
         if self.size == 0:
             return None
-        ret_obj = self.heap[1]
-        self.swap_elements(1, self.size)
+        tree = self.heap[1]
+        self.keys[1], self.heap[1] = self.keys[self.size], self.heap[self.size]
         self.size -= 1
-        self.sink(1)
-        return ret_obj[1]
+        if self.size > 0:
+            self.sink(1)
+        return tree
     
     def update(self, time, tree):
         """
-        Updates the values at the specified index of the heap and calls rise and sink on it
+        Changes the time of tree and calls rise and sink on it
         Input: 
             time: time taken to go to tree
-            tree: Tree object
-        Pre-condition: time is a non-negative integer
-        Post-condition: [time, tree] is in its right position in the heap
+            tree: Tree id
+        Pre-condition: time is a non-negative number and tree is in the heap
+        Post-condition: tree is in its right position in the heap
         Complexity:
             Time-complexity: O(log n), where n is the number of items in the heap
             Space-complexity:
-                Input: O(1), Inputs are an integer and a Tree object
+                Input: O(1), Inputs are an integer and a Tree id
                 Aux: O(1), No extra space needed
 
         """
-        self.heap[self.indexes[tree.id]] = [time, tree]
-        self.rise(self.indexes[tree.id])
-        self.sink(self.indexes[tree.id])
\ No newline at end of file
+        i = self.indexes[tree]
+        self.keys[i] = time
+        self.rise(i)
+        self.sink(self.indexes[tree])
+
+    def clear(self):
+        """
+        Removes every item from the heap
+        Complexity(Space and time): O(1)
+        """
+        self.size = 0
+
+
+class DaryHeap:
+    """
+    d-ary MinHeap of Tree ids ordered by time (4-ary by default), 0-indexed with parallel time and Tree id
+    arrays. A wider heap is shallower, so rise is cheaper while sink compares more children per level.
+    """
+
+    __slots__ = ('d', 'keys', 'heap', 'indexes', 'size')
+
+    def __init__(self, max_size, d=4):
+        """
+        This init initializes an empty DaryHeap
+        Input:
+            max_size: an integer representing the length of the heap (Tree ids are below max_size)
+            d: number of children of every item
+
+        Pre-condition: max_size is a non-negative integer and d >= 2
+        Post-condition: keys, heap and indexes are arrays of length max_size
+        Time complexity: O(max_size)
+        Space complexity: O(max_size)
+        """
+        self.d = d
+        self.keys = [None] * max_size
+        self.heap = array('q', [0]) * max_size
+        self.indexes = array('q', [0]) * max_size
+        self.size = 0
+
+    def insert(self, time, tree):
+        """
+        Inserts tree with the given time into the heap
+        Input:
+            time: time taken to tree
+            tree: Tree id
+        Pre-condition: tree is a Tree id not in the heap and self.size < max_size
+        Time-Complexity: O(log_d n), where n is the number of items in the heap
+        Space-Complexity: O(1)
+        """
+        if self.size >= len(self.heap):
+            raise Exception("Heap is full")
+        self.keys[self.size] = time
+        self.heap[self.size] = tree
+        self.indexes[tree] = self.size
+        self.size += 1
+        self.rise(self.size - 1)
+
+    def rise(self, i):
+        """
+        Rise element at index i to its correct position
+        Time-Complexity: O(log_d n), where n is the number of items in the heap
+        Space-Complexity: O(1)
+        """
+        keys, heap, indexes, d = self.keys, self.heap, self.indexes, self.d
+        time, tree = keys[i], heap[i]
+        while i > 0:
+            parent = (i - 1) // d
+            if not time < keys[parent]:
+                break
+            keys[i], heap[i] = keys[parent], heap[parent]
+            indexes[heap[i]] = i
+            i = parent
+        keys[i], heap[i] = time, tree
+        indexes[tree] = i
+
+    def sink(self, i):
+        """
+        Sink element at index i to its correct position
+        Time-Complexity: O(d log_d n), where n is the number of items in the heap
+        Space-Complexity: O(1)
+        """
+        keys, heap, indexes, d, size = self.keys, self.heap, self.indexes, self.d, self.size
+        time, tree = keys[i], heap[i]
+        while True:
+            first = d * i + 1
+            if first >= size:
+                break
+            #Smallest child of i
+            j = first
+            for child in range(first + 1, min(first + d, size)):
+                if keys[child] < keys[j]:
+                    j = child
+            if not keys[j] < time:
+                break
+            keys[i], heap[i] = keys[j], heap[j]
+            indexes[heap[i]] = i
+            i = j
+        keys[i], heap[i] = time, tree
+        indexes[tree] = i
+
+    def serve(self):
+        """
+        Remove and return the Tree id with the minimum time
+        Time-Complexity: O(d log_d n), where n is the number of items in the heap
+        Space-Complexity: O(1)
+        """
+        if self.size == 0:
+            return None
+        tree = self.heap[0]
+        self.size -= 1
+        self.keys[0], self.heap[0] = self.keys[self.size], self.heap[self.size]
+        if self.size > 0:
+            self.sink(0)
+        return tree
+
+    def update(self, time, tree):
+        """
+        Changes the time of tree and moves it to its right position
+        Pre-condition: tree is in the heap
+        Time-Complexity: O(d log_d n), where n is the number of items in the heap
+        Space-Complexity: O(1)
+        """
+        i = self.indexes[tree]
+        self.keys[i] = time
+        self.rise(i)
+        self.sink(self.indexes[tree])
+
+    def clear(self):
+        """
+        Removes every item from the heap
+        Complexity(Space and time): O(1)
+        """
+        self.size = 0
+
+
+class PairingHeap:
+    """
+    Pairing heap of Tree ids ordered by time. Every Tree has one node, stored in arrays indexed by Tree id:
+    its first child, its next sibling and prev (its left sibling, or its parent for a first child).
+    insert and update (a decrease of the time) are O(1), serve is O(log n) amortized.
+    """
+
+    __slots__ = ('keys', 'child', 'sibling', 'prev', 'root', 'size')
+
+    def __init__(self, max_size):
+        """
+        This init initializes an empty PairingHeap
+        Input:
+            max_size: an integer representing the length of the heap (Tree ids are below max_size)
+        Time complexity: O(max_size)
+        Space complexity: O(max_size)
+        """
+        self.keys = [None] * max_size
+        self.child = array('q', [-1]) * max_size
+        self.sibling = array('q', [-1]) * max_size
+        self.prev = array('q', [-1]) * max_size
+        self.root = -1
+        self.size = 0
+
+    def meld(self, a, b):
+        """
+        Links the heaps rooted at a and b, the root with the larger time becomes the first child of the other
+        Input:
+            a, b: Tree ids of two roots
+        Return: the Tree id of the new root
+        Complexity(Space and time): O(1)
+        """
+        if self.keys[b] < self.keys[a]:
+            a, b = b, a
+        first = self.child[a]
+        self.sibling[b] = first
+        if first != -1:
+            self.prev[first] = b
+        self.prev[b] = a
+        self.child[a] = b
+        return a
+
+    def insert(self, time, tree):
+        """
+        Inserts tree with the given time into the heap
+        Pre-condition: tree is a Tree id not in the heap
+        Complexity(Space and time): O(1)
+        """
+        self.keys[tree] = time
+        self.child[tree] = self.sibling[tree] = self.prev[tree] = -1
+        self.root = tree if self.root == -1 else self.meld(self.root, tree)
+        self.size += 1
+
+    def serve(self):
+        """
+        Remove and return the Tree id with the minimum time, pairing up the children of the root from left to
+        right and melding the pairs from right to left
+        Time-Complexity: O(log n) amortized, where n is the number of items in the heap
+        Space-Complexity: O(c), where c is the number of children of the root
+        """
+        if self.size == 0:
+            return None
+        tree = self.root
+        sibling = self.sibling
+        pairs = []
+        a = self.child[tree]
+        while a != -1:
+            b = sibling[a]
+            if b == -1:
+                pairs.append(a)
+                break
+            following = sibling[b]
+            sibling[a] = sibling[b] = -1
+            pairs.append(self.meld(a, b))
+            a = following
+        root = -1
+        for a in reversed(pairs):
+            sibling[a] = -1
+            self.prev[a] = -1
+            root = a if root == -1 else self.meld(a, root)
+        self.root = root
+        self.size -= 1
+        return tree
+
+    def update(self, time, tree):
+        """
+        Lowers the time of tree, cutting its subtree off and melding it back with the root
+        Pre-condition: tree is in the heap and time is not larger than its current time
+        Complexity(Space and time): O(1)
+        """
+        self.keys[tree] = time
+        if tree == self.root:
+            return
+        before, after = self.prev[tree], self.sibling[tree]
+        if self.child[before] == tree:
+            self.child[before] = after
+        else:
+            self.sibling[before] = after
+        if after != -1:
+            self.prev[after] = before
+        self.sibling[tree] = self.prev[tree] = -1
+        self.root = self.meld(self.root, tree)
+
+    def clear(self):
+        """
+        Removes every item from the heap (the nodes are reset when they are inserted again)
+        Complexity(Space and time): O(1)
+        """
+        self.root = -1
+        self.size = 0
+
+
+class LazyHeap:
+    """
+    MinHeap on top of heapq with lazy deletion: update pushes a new (time, tree) entry and serve skips
+    entries whose time is no longer the time of their Tree.
+    """
+
+    __slots__ = ('entries', 'keys', 'size')
+
+    def __init__(self, max_size):
+        """
+        This init initializes an empty LazyHeap
+        Input:
+            max_size: an integer representing the length of the heap (Tree ids are below max_size)
+        Time complexity: O(max_size)
+        Space complexity: O(max_size)
+        """
+        self.entries = []
+        #Current time of every Tree in the heap, None for the others
+        self.keys = [None] * max_size
+        self.size = 0
+
+    def insert(self, time, tree):
+        """
+        Inserts tree with the given time into the heap
+        Pre-condition: tree is a Tree id not in the heap
+        Time-Complexity: O(log m), where m is the number of entries in the heap
+        Space-Complexity: O(1)
+        """
+        self.keys[tree] = time
+        heapq.heappush(self.entries, (time, tree))
+        self.size += 1
+
+    def serve(self):
+        """
+        Remove and return the Tree id with the minimum time, dropping outdated entries on the way
+        Time-Complexity: O(log m) amortized, where m is the number of entries in the heap
+        Space-Complexity: O(1)
+        """
+        while self.size > 0:
+            time, tree = heapq.heappop(self.entries)
+            if self.keys[tree] is not None and self.keys[tree] == time:
+                self.keys[tree] = None
+                self.size -= 1
+                if self.size == 0:
+                    #Only outdated entries are left, which a Tree inserted again could be mistaken for
+                    self.entries.clear()
+                return tree
+        return None
+
+    def update(self, time, tree):
+        """
+        Changes the time of tree by pushing a new entry, the previous entry becomes outdated
+        Pre-condition: tree is in the heap
+        Time-Complexity: O(log m), where m is the number of entries in the heap
+        Space-Complexity: O(1)
+        """
+        if self.keys[tree] != time:
+            self.keys[tree] = time
+            heapq.heappush(self.entries, (time, tree))
+
+    def clear(self):
+        """
+        Removes every item from the heap
+        Time-Complexity: O(m), where m is the number of entries in the heap
+        Space-Complexity: O(1)
+        """
+        for time, tree in self.entries:
+            self.keys[tree] = None
+        self.entries.clear()
+        self.size = 0
+
+
+class BucketQueue:
+    """
+    Dial's bucket queue of Tree ids for integer times and road weights of at most max_weight. Every time that
+    can still be served lies in [current, current + max_weight], so max_weight+1 buckets used circularly
+    are enough. update appends the Tree to its new bucket and serve skips outdated entries.
+    """
+
+    __slots__ = ('buckets', 'keys', 'current', 'size')
+
+    def __init__(self, max_size, max_weight):
+        """
+        This init initializes an empty BucketQueue
+        Input:
+            max_size: an integer representing the length of the queue (Tree ids are below max_size)
+            max_weight: largest road weight, a non-negative integer
+        Time complexity: O(max_size + max_weight)
+        Space complexity: O(max_size + max_weight)
+        """
+        self.buckets = [[] for _ in range(max_weight + 1)]
+        #Current time of every Tree in the queue, None for the others
+        self.keys = [None] * max_size
+        #Smallest time that can still be in the queue, None until a time is inserted
+        self.current = None
+        self.size = 0
+
+    def insert(self, time, tree):
+        """
+        Inserts tree with the given time into the queue
+        Pre-condition: tree is a Tree id not in the queue and time is an integer within max_weight of
+                       the last time served
+        Complexity(Space and time): O(1)
+        """
+        self.size += 1
+        self.update(time, tree)
+
+    def update(self, time, tree):
+        """
+        Lowers the time of tree, the entry in its previous bucket becomes outdated
+        Pre-condition: time is not larger than the current time of tree, and not smaller than the last time
+                       served (before the first serve, all times are within max_weight of each other)
+        Complexity(Space and time): O(1)
+        """
+        if self.current is None or time < self.current:
+            self.current = time
+        self.keys[tree] = time
+        self.buckets[time % len(self.buckets)].append(tree)
+
+    def serve(self):
+        """
+        Remove and return the Tree id with the minimum time by scanning the buckets from the current time
+        Time-Complexity: O(1) amortized per bucket passed and per entry skipped
+        Space-Complexity: O(1)
+        """
+        if self.size == 0:
+            return None
+        keys, buckets, current = self.keys, self.buckets, self.current
+        while True:
+            bucket = buckets[current % len(buckets)]
+            while len(bucket) > 0:
+                tree = bucket.pop()
+                if keys[tree] == current:
+                    keys[tree] = None
+                    self.current = current
+                    self.size -= 1
+                    return tree
+            current += 1
+
+    def clear(self):
+        """
+        Removes every item from the queue
+        Time-Complexity: O(W+m), where W is max_weight and m the number of entries left in the buckets
+        Space-Complexity: O(1)
+        """
+        for bucket in self.buckets:
+            for tree in bucket:
+                self.keys[tree] = None
+            bucket.clear()
+        self.current = None
+        self.size = 0
+
+
+class EscapeStats:
+    """
+    Counters and timers of an instrumented TreeMap.escape() (see TreeMap.on_escape).
+    The heap counters add up the operations of both searches; rises and sinks are the levels items moved in a
+    binary MinHeap, and stay 0 on the other backends. times maps each phase ('forward', 'arrival', 'backward',
+    'combine' and 'total') to its wall time in seconds. Only 'total' is timed when the landmarks or a dynamic
+    search answer the query.
+    """
+
+    __slots__ = ('inserts', 'serves', 'updates', 'rises', 'sinks', 'relaxed', 'settled', 'times')
+
+    def __init__(self):
+        """
+        This init initializes EscapeStats with every counter at 0
+        Complexity(Space and time): O(1)
+        """
+        self.inserts = 0
+        self.serves = 0
+        self.updates = 0
+        self.rises = 0
+        self.sinks = 0
+        #Roads relaxed and Trees finalized by both searches
+        self.relaxed = 0
+        self.settled = 0
+        self.times = {}
+
+    def as_dict(self):
+        """
+        Returns the counters and the phase times as a flat dictionary, the times keyed by '<phase>_time'
+        Complexity(Space and time): O(1)
+        """
+        stats = {name: getattr(self, name) for name in self.__slots__ if name != 'times'}
+        for phase, seconds in self.times.items():
+            stats[phase + '_time'] = seconds
+        return stats
+
+
+class CountingHeap:
+    """
+    Wraps any priority queue backend and counts its operations into an EscapeStats. It is only put in a
+    SearchSpace for an instrumented escape(), so the backends themselves carry no counters.
+    A binary MinHeap moves an item one level per step of rise or sink, so the levels an item crossed are read
+    from its position in the heap before and after each operation.
+    """
+
+    __slots__ = ('inner', 'stats', 'levels')
+
+    def __init__(self, inner, stats):
+        """
+        Input:
+            inner: the priority queue to count the operations of
+            stats: EscapeStats the counts are added to
+        Complexity(Space and time): O(1)
+        """
+        self.inner = inner
+        self.stats = stats
+        self.levels = isinstance(inner, MinHeap)
+
+    @property
+    def size(self):
+        return self.inner.size
+
+    def insert(self, time, tree):
+        """
+        Inserts tree into the wrapped heap, counting the insert and the levels it rose
+        Complexity(Space and time): the complexity of the wrapped insert
+        """
+        inner = self.inner
+        inner.insert(time, tree)
+        self.stats.inserts += 1
+        if self.levels:
+            self.stats.rises += inner.size.bit_length() - inner.indexes[tree].bit_length()
+
+    def serve(self):
+        """
+        Serves the wrapped heap, counting the serve and the levels the last item sank from the root
+        Complexity(Space and time): the complexity of the wrapped serve
+        """
+        inner = self.inner
+        last = inner.heap[inner.size] if self.levels and inner.size > 1 else None
+        tree = inner.serve()
+        self.stats.serves += 1
+        if last is not None:
+            self.stats.sinks += inner.indexes[last].bit_length() - 1
+        return tree
+
+    def update(self, time, tree):
+        """
+        Updates tree in the wrapped heap, counting the update and the levels it rose or sank
+        Complexity(Space and time): the complexity of the wrapped update
+        """
+        inner = self.inner
+        before = inner.indexes[tree] if self.levels else 0
+        inner.update(time, tree)
+        self.stats.updates += 1
+        if self.levels:
+            after = inner.indexes[tree]
+            if after < before:
+                self.stats.rises += before.bit_length() - after.bit_length()
+            else:
+                self.stats.sinks += after.bit_length() - before.bit_length()
+
+    def clear(self):
+        """
+        Empties the wrapped heap
+        Complexity(Space and time): the complexity of the wrapped clear
+        """
+        self.inner.clear()
+
+
+#Largest road weight for which TreeMap.escape() picks a BucketQueue by default
+BUCKET_MAX_WEIGHT = 1024
+
+#Priority queue backends which TreeMap.escape() can run on, by name
+HEAPS = {
+    "binary": MinHeap,
+    "4-ary": DaryHeap,
+    "pairing": PairingHeap,
+    "heapq": LazyHeap,
+    "bucket": BucketQueue,
+}
@@ -3,184 +3,215 @@ Assignment 2 by Raynen Jivash Athirathan 32836791
 """
 
 
-class Node:
-    """
-    This is a Node class which will be initalized/used in the SuffixTrie class
-    """
-
-    def __init__(self):
-        """
-        This init function initializes a Node. A Node has 2 attributes, one being self.link which is used 
-        to refer to the other Nodes (if they exist) and the other being self.ids which 
-        contain the starting indexes of suffixes in which this Node could be found in
+from array import array
 
-        Precondition: No precondition
-        Postcondition: The node has 2 lists
 
-        Input: Does not take in any input
-        Return: Does not return anything
-
-        Time complexity: 
-            Best case analysis: O(1), creating self.link and self.ids are constant operations
-            Worst case analysis: O(1), creating self.link and self.ids are constant operations
-        Space complexity: 
-            Input space analysis: O(1), no input
-            Aux space analysis: O(1), self.link is a fixed size and self.ids is empty
-        """
-        # index 0,1,2,3 = A,B,C,D in self.link
-        self.link = [None] * 4
-        # contains the index of suffixes
-        self.ids = []
-
-    def add_id(self, id):
-        """
-        add_id adds the integer passed in (id) into self.ids
-
-        Precondition: id is a non-negative integer
-        Postcondition: id is appended to self.ids
-
-        Input: id to be appended into self.ids
-        Return: None
-
-        Time complexity: 
-            Best case analysis:O(1), adding to a list is a constant operation
-            Worst case analysis:O(1), adding to a list is a constant operation
-        Space complexity: 
-            Input space analysis:O(1), input is an integer
-            Aux space analysis:O(1), does not require auxiliary space
-        """
-        self.ids.append(id)
-    
-        
-class SuffixTrie:
+def _suffix_array(s, k):
+    """
+    Builds the suffix array of s with SA-IS (induced sorting): the suffixes are classified as S-type (smaller
+    than the next suffix) or L-type, the leftmost S-type (LMS) substrings are sorted by inducing, named, and only
+    if two of them share a name is the shorter string of names sorted recursively.
+
+    Precondition: s is a list of integers in [0, k) whose last item is 0 and is the only 0
+    Postcondition: s is not changed
+
+    Input:
+        s: the string to sort the suffixes of, as integers
+        k: size of the alphabet of s
+    Return:
+        A list with the starting index of every suffix of s, in lexicographic order of the suffixes
+
+    Time complexity:
+        Best and worst case analysis: O(N+k), where N is the length of s (each level of recursion is linear and
+                                      at most half as long as the previous one)
+    Space complexity:
+        Input space analysis: O(N), where N is the length of s
+        Aux space analysis: O(N+k), where N is the length of s
+    """
+    n = len(s)
+    if n == 1:
+        return [0]
+
+    # stype[i] is 1 if the suffix at i is S-type (smaller than the suffix at i+1), the sentinel is S-type
+    stype = bytearray(n)
+    stype[n - 1] = 1
+    for i in range(n - 2, -1, -1):
+        if s[i] < s[i + 1] or (s[i] == s[i + 1] and stype[i + 1]):
+            stype[i] = 1
+    # lms[i] is 1 if i is the start of an LMS substring (an S-type suffix following an L-type suffix)
+    lms = bytearray(n)
+    for i in range(1, n):
+        if stype[i] and not stype[i - 1]:
+            lms[i] = 1
+
+    # bucket of every letter: the suffixes starting with letter c are sa[starts[c]:starts[c+1]]
+    counts = [0] * k
+    for c in s:
+        counts[c] += 1
+    starts = [0] * (k + 1)
+    for c in range(k):
+        starts[c + 1] = starts[c] + counts[c]
+
+    def induce(lms_order):
+        # The LMS suffixes go at the ends of their buckets in the given order, the L-type suffixes are induced
+        # from left to right and the S-type suffixes from right to left
+        sa = [-1] * n
+        tails = starts[1:]
+        for i in reversed(lms_order):
+            tails[s[i]] -= 1
+            sa[tails[s[i]]] = i
+        heads = starts[:-1]
+        for j in range(n):
+            i = sa[j] - 1
+            if i >= 0 and not stype[i]:
+                sa[heads[s[i]]] = i
+                heads[s[i]] += 1
+        tails = starts[1:]
+        for j in range(n - 1, -1, -1):
+            i = sa[j] - 1
+            if i >= 0 and stype[i]:
+                tails[s[i]] -= 1
+                sa[tails[s[i]]] = i
+        return sa
+
+    # Sorting the LMS substrings
+    positions = [i for i in range(n) if lms[i]]
+    sa = induce(positions)
+    sorted_lms = [i for i in sa if lms[i]]
+
+    # Naming the LMS substrings, equal substrings get the same name
+    names = [-1] * n
+    name = 0
+    names[sorted_lms[0]] = 0
+    for previous, current in zip(sorted_lms, sorted_lms[1:]):
+        j = 0
+        while True:
+            if s[previous + j] != s[current + j] or stype[previous + j] != stype[current + j]:
+                name += 1
+                break
+            if j > 0 and (lms[previous + j] or lms[current + j]):
+                if not (lms[previous + j] and lms[current + j]):
+                    name += 1
+                break
+            j += 1
+        names[current] = name
+
+    # Sorting the LMS suffixes, recursing on the string of names only if a name is shared
+    reduced = [names[i] for i in positions]
+    if name + 1 == len(reduced):
+        reduced_sa = [0] * len(reduced)
+        for i, label in enumerate(reduced):
+            reduced_sa[label] = i
+    else:
+        reduced_sa = _suffix_array(reduced, name + 1)
+    return induce([positions[i] for i in reduced_sa])
+
+
+class SuffixArray:
     """
-    This is a SuffixTrie class which contains all suffixes of the input genome starting from a root
+    This is a SuffixArray class which holds every suffix of the input genome in sorted order, as the suffix
+    array of the genome and the longest common prefix (LCP) of every pair of neighbouring suffixes.
+    It answers the same search(key) queries as a suffix trie in O(N) space instead of O(N^2).
     """
 
     def __init__(self, genome):
         """
-        This init function initializes the SuffixTrie class, it takes the input genome and calls insert
-        len(genome) number of times with start as an input. start is the starting index of the suffix being
-        inserted. If genome was "AABB", start at 0 would represent "AABB". start at 1 would represent "ABB"
-        and so on until the last letter of genome.
+        This init function builds the suffix array of genome with SA-IS and its LCP array with Kasai's algorithm.
+        If genome was "AABB", self.suffixes would be [0, 1, 3, 2] ("AABB", "ABB", "B", "BB").
 
-        Precondition: genome is a non-empty string
-        Postcondition: A SuffixTrie has been initialized based on self.root and genome
+        Precondition: genome is a string
+        Postcondition: self.suffixes[r] is the starting index of the r-th smallest suffix of genome and
+                       self.lcp[r] is the length of the longest common prefix of the suffixes at ranks r-1 and r
+                       (0 for r = 0)
 
-        Input: genome = The string which the SuffixTrie class will be built on (The class would contain
-                        all suffixes of genome)
+        Input: genome = The string whose suffixes are sorted
         Return: None
 
-        Time complexity: 
-            Best and worst case analysis: O(N^2), complexity of insert is O(N) and insert is called N number of times
-                                          which would mean complexity is O(N)*O(N) = O(N^2)
-            
-        Space complexity: 
+        Time complexity:
+            Best and worst case analysis: O(N), where N is the length of genome
+        Space complexity:
             Input space analysis: O(N), where N is the length of genome
-            Aux space analysis: O(N), where N is the length of genome (Complexity is based on aux space of insert)
+            Aux space analysis: O(N), where N is the length of genome (two arrays of N integers)
         """
-        # String that the suffix trie will be built on
         self.genome = genome
-        # Root of the suffix trie
-        self.root = Node()
-
-        # start represents the starting index of the suffix we would like to insert (like a suffix id)
-        # it is incremented in every iteration to ensure all suffixes are added
-        start = 0
-        for i in range(len(genome)):
-            self.insert(start)
-            start += 1
-
-        
-
-    
-    def insert(self, suffix_index):
-        """
-        The insert function inserts suffixes of self.genome into the trie and adds suffix_index to the self.ids list 
-        of each node being inserted or traversed through. It loops from suffix_index to the length of self.genome, 
-        adding suffix_index to the self.ids lists of the Nodes being traversed through or the new Nodes being inserted
-
-        Precondition: suffix_index is a non-negative integer
-        Postcondition: suffix_index has been added to every Node visited or every new Node created
-
-        Input: start = An integer which is used to determine the beginning index of the suffixes being inserted
-        Return: Does not return anything
-
-        Time complexity: 
-            Best case analysis: O(N) where N is the length of self.genome
-            Worst case analysis: O(N) where N is the length of self.genome
-        Space complexity: 
-            Input space analysis: O(1), suffix_index is an integer
-            Aux space analysis: O(N), where N is the length of self.genome (An integer is added to a Node's list (Different Nodes) N number of times 
-                                which would take O(N) space)
-        """
-        
-        # begin from root
-        current = self.root
-        # go through the key 1 by 1
-        for i in range(suffix_index, len(self.genome)):
-            # calculate index
-            # A = 1, B = 2, C = 3, D = 4 
-            index = ord(self.genome[i]) - 65 
-            # if path exists, add suffix_index to the Node and set current to current.link[index]
-            if current.link[index] is not None:
-                current.link[index].add_id(suffix_index)
-                current = current.link[index]
-
-            # if path doesn't exist       
+        n = len(genome)
+
+        # Letters are numbered from 1 in sorted order, 0 is the sentinel ending the string
+        letters = {letter: rank + 1 for rank, letter in enumerate(sorted(set(genome)))}
+        s = [letters[letter] for letter in genome]
+        s.append(0)
+        # The sentinel suffix is always first, it is not a suffix of genome
+        self.suffixes = array('q', _suffix_array(s, len(letters) + 1)[1:])
+
+        # Kasai: the LCP of the suffix at i with the suffix before it in sorted order is at least the LCP of the
+        # suffix at i-1 minus one, so the LCPs are computed in text order with at most 2N character comparisons
+        rank = array('q', [0]) * n
+        for r, i in enumerate(self.suffixes):
+            rank[i] = r
+        self.lcp = array('q', [0]) * n
+        h = 0
+        for i in range(n):
+            if rank[i] > 0:
+                j = self.suffixes[rank[i] - 1]
+                while i + h < n and j + h < n and genome[i + h] == genome[j + h]:
+                    h += 1
+                self.lcp[rank[i]] = h
+                if h > 0:
+                    h -= 1
             else:
-                # create a new node
-                current.link[index] = Node()
-                current.link[index].add_id(suffix_index)   #Adding starting index id to self.ids
-                # Set new current to current.link[index]
-                current = current.link[index]
-            
-           
-            
+                h = 0
 
     def search(self, key):
         """
-        The search function searches for a Node in the SuffixTrie based on the input (key) and returns
-        the self.ids list of the Node that the query (key) points to if the query (key) does exist. If
-        it does not however, search would return an empty list.
+        The search function returns the starting indexes of every occurrence of key in the genome. The first
+        suffix starting with key is found by binary search over the suffix array, and the other ones follow it
+        for as long as their LCP with the suffix before them is at least the length of key.
 
         Precondition: key is a non-empty string
         Postcondition: returns a list
 
         Input:
-            start: key, the query which we would traverse through
+            key: the query to look for
         Return:
-            Returns the self.ids list of the final Node traversed through or returns an empty list if
-            the path of the query does not exist
-
-        Time complexity: 
-            Best case analysis: O(1) where the first letter of the key does not have a link (Does not exist)
-            Worst case analysis: O(N) where N is the length of the key
-        Space complexity: 
-            Input space analysis: O(N), where N is the length of key
-            Aux space analysis: O(1), does not need extra space
+            The starting indexes of key in the genome in increasing order, or an empty list if key does not occur
+
+        Time complexity:
+            Best case analysis: O(M log N), where key does not occur
+            Worst case analysis: O(M log N + K log K), where M is the length of key, N the length of the genome and
+                                 K the number of occurrences (sorted back into text order)
+        Space complexity:
+            Input space analysis: O(M), where M is the length of key
+            Aux space analysis: O(K), where K is the number of occurrences
         """
-        # begin from root
-        current = self.root
-       
-        for char in key:
-            # calculate index
-            index = ord(char) - 65 
-            # if path exists
-            if current.link[index] is not None:
-                # ret_list.append(current.id)
-                current = current.link[index]
-                # If first iteration hold the node
-             
-            # if path doesn't exist
+        if len(key) == 0:
+            return []
+        genome, suffixes, lcp = self.genome, self.suffixes, self.lcp
+        m, n = len(key), len(suffixes)
+
+        # First rank whose suffix is not smaller than key (comparing at most m characters)
+        low, high = 0, n
+        while low < high:
+            middle = (low + high) // 2
+            i = suffixes[middle]
+            if genome[i:i + m] < key:
+                low = middle + 1
             else:
-                return []
-            
-        # Return self.ids of the last node traversed from the query
-        return current.ids
-        
-        
-          
+                high = middle
+        if low == n or genome[suffixes[low]:suffixes[low] + m] != key:
+            return []
+
+        found = [suffixes[low]]
+        low += 1
+        while low < n and lcp[low] >= m:
+            found.append(suffixes[low])
+            low += 1
+        found.sort()
+        return found
+
+
+#Name of the index which the suffix array replaced
+SuffixTrie = SuffixArray
+
 
 class OrfFinder:
     """
@@ -190,39 +221,34 @@ class OrfFinder:
 
     def __init__(self, genome):
         """
-        This init function initializes the OrfFinder class with a given input (genome). The __init__ instantiates
-        2 suffix tries, one built with genome (self.genome) and one built with the reverse of genome (self.genome_reverse)
+        This init function initializes the OrfFinder class with a given input (genome). The __init__ builds
+        a single suffix array of genome (self.genome), which answers the lookups of both start and end
 
-        Precondition: genome is a non-empty string
-        Postcondition: Two SuffixTrie's are instantiated (Using self.genome and self.genome_reverse)
+        Precondition: genome is a non-empty string or bytes
+        Postcondition: A SuffixArray of self.genome is built
 
         Input:
             genome: A non-empty string containing only uppercase [A-D], genome is the string which
-                    we obtain our substrings from
+                    we obtain our substrings from. It may be given as bytes, then find returns bytes
         Return: None (Does not return anything)
 
         Time complexity: 
-            Best case analysis: O(N^2), where N is the length of the genome
-            Worst case analysis: O(N^2), where N is the length of the genome
+            Best case analysis: O(N), where N is the length of the genome
+            Worst case analysis: O(N), where N is the length of the genome
         Space complexity: 
             Input space analysis: O(N), where N is the length of genome
-            Aux space analysis: O(N^2), where N is the length of genome (O(N^2) is the space required for each suffix trie)
+            Aux space analysis: O(N), where N is the length of genome (O(N) is the space required for the suffix array)
         """
         self.genome = genome
-        # Reversing genome
-        self.genome_reverse = ''.join(reversed(genome))
-        
-        self.suffix_trie = SuffixTrie(self.genome)  # Original SuffixTrie
-        self.reverse_suffix_trie = SuffixTrie(self.genome_reverse) # Reversed SuffixTrie
+        self.suffix_trie = SuffixArray(self.genome)  # Suffix array of genome
+        # Bytes of the genome which find_iter slices, made on first use if genome is a string
+        self.genome_bytes = genome if isinstance(genome, (bytes, bytearray)) else None
 
 
-    def find(self, start, end):
+    def find(self, start, end, min_len=None, max_len=None):
         """
         The find function returns all substrings of genome which have start as a prefix and
-        end as a suffix. find calls the search function with start on self.suffix_trie and with
-        end on self.reverse_suffix_trie to obtain the indexes in which both start and end could
-        be found in the string genome. The indexes are then used to obtain the substrings which 
-        match start and end.
+        end as a suffix, as a list of the substrings spanned by find_spans.
 
         Precondition: start and end are non-empty strings
         Postcondition: returns a list
@@ -230,39 +256,187 @@ class OrfFinder:
         Input:
             start: The prefix of the strings to be returned
             end: The suffix of the strings to be returned
+            min_len, max_len: bounds on the length of the strings to be returned, no bound if None
         Return:
             return_list: A list containing all of the strings which have start as a prefix and 
                          end as a suffix (List may possibly be empty) 
 
         Time complexity: 
-            Best and Worst case analysis: O(T+U+V), where T is the length of the string start, U is the length of the string
-                                          end and V being the number of characters in the output list
+            Best and Worst case analysis: O((T+U) log N + K log K + V), where T is the length of the string start, U is the length
+                                          of the string end, N the length of genome, K the number of occurrences of start and
+                                          end and V being the number of characters in the output list (pairs which do not
+                                          fit are never visited)
         Space complexity: 
             Input space analysis: O(T+U), where T is the length of the start and U is the length of the end
             Aux space analysis: O(V), where V is the total number of characters in the return_list (Could be O(N^2)
                                 in the worst-case and O(1) in the best-case)
         """
-        # List containing strings to be returned
-        return_list = [] 
+        # returns the strings matched by start and end
+        return [self.genome[begin:stop] for begin, stop in self.find_spans(start, end, min_len, max_len)]
+
+    def find_spans(self, start, end, min_len=None, max_len=None):
+        """
+        The find_spans function yields the (start_index, end_index) span of every substring of genome which has
+        start as a prefix and end as a suffix, one at a time, so that no substring is copied.
+        The bounds on the length are applied while pairing the indexes of start and end (see windows), so
+        substrings out of bounds are never generated.
+
+        Precondition: start and end are non-empty strings (or bytes)
+        Postcondition: yields the spans in the order of find: by increasing start_index, then by decreasing end_index
+
+        Input:
+            start: The prefix of the substrings
+            end: The suffix of the substrings
+            min_len, max_len: bounds on the length of the substrings, no bound if None
+        Return:
+            A generator of (start_index, end_index) pairs, genome[start_index:end_index] being the substring
+
+        Time complexity: 
+            Best and Worst case analysis: O((T+U) log N + K log K + P), where K is the number of occurrences of start and
+                                          end and P the number of spans
+        Space complexity: 
+            Input space analysis: O(T+U), where T is the length of the start and U is the length of the end
+            Aux space analysis: O(K), the occurrences of start and end
+        """
+        starts, final_ends, shortest, longest = self.occurrences(start, end, min_len, max_len)
+        for indexes, first, last in self.windows(starts, final_ends, shortest, longest):
+            # The substrings are listed from the last end to the first one
+            for position in range(last - 1, first - 1, -1):
+                yield indexes, final_ends[position]
+
+    def count(self, start, end, min_len=None, max_len=None):
+        """
+        The count function returns the number of substrings of genome which have start as a prefix and end as a
+        suffix (the length of find), from the sizes of the windows of ends paired with every start, without
+        generating a single pair.
+
+        Precondition: start and end are non-empty strings (or bytes)
+
+        Input:
+            start: The prefix of the substrings
+            end: The suffix of the substrings
+            min_len, max_len: bounds on the length of the substrings, no bound if None
+        Return:
+            The number of substrings, a non-negative integer
+
+        Time complexity: 
+            Best and Worst case analysis: O((T+U) log N + K log K), where K is the number of occurrences of start and end
+        Space complexity: 
+            Input space analysis: O(T+U), where T is the length of the start and U is the length of the end
+            Aux space analysis: O(K), the occurrences of start and end
+        """
+        starts, final_ends, shortest, longest = self.occurrences(start, end, min_len, max_len)
+        return sum(last - first for _, first, last in self.windows(starts, final_ends, shortest, longest))
+
+    def occurrences(self, start, end, min_len=None, max_len=None):
+        """
+        The occurrences function calls the search function of self.suffix_trie with start and with end to obtain
+        the indexes in which both start and end could be found in the string genome, and the bounds on the length
+        of a substring from an index of start to an index where end stops
+
+        Input:
+            start: The prefix of the substrings
+            end: The suffix of the substrings
+            min_len, max_len: bounds on the length of the substrings, no bound if None
+        Return:
+            (starts, final_ends, shortest, longest):
+            starts: the indexes where start begins, in increasing order
+            final_ends: the indexes where end stops, in increasing order
+            shortest, longest: the bounds on the length of a substring, a substring fits both start and end if it is
+                               at least len(start)+len(end) long
+
+        Time complexity: 
+            Best and Worst case analysis: O((T+U) log N + K log K), where K is the number of occurrences of start and end
+        Space complexity: 
+            Aux space analysis: O(K), where K is the number of occurrences of start and end
+        """
+        start, end = self.key(start), self.key(end)
         # Calling the search function to obtain the indexes in which start and end could be found
         starts = self.suffix_trie.search(start)
-        ends = self.reverse_suffix_trie.search(''.join(reversed(end)))  # Finding for end in the reversed suffix trie
+        ends = self.suffix_trie.search(end)
 
-        # The indexes from ends could not be used directly as they are the indexes from the reversed genome string
-        # To ensure that the right indexes are used, the length of the genome is subtracted by each index in ends
-        # To obtain the correct index in the original genome string (Not the reversed string)
+        # The indexes from ends are where end begins, a substring ending with end stops len(end) later
         final_ends = []
         for number in ends:
-            final_ends.append(len(self.genome)-number)
-        
-        # Nested for loop to iterate through final_ends list for every index in starts
-        # Checks if the length of the query is greater than the length of the string
-        # If not, then the sliced string on self.genome with indexes and indexes2 is added to return_list
+            final_ends.append(number+len(end))
+
+        shortest = len(start)+len(end)
+        if min_len is not None and min_len > shortest:
+            shortest = min_len
+        longest = float('inf') if max_len is None else max_len
+        return starts, final_ends, shortest, longest
+
+    def windows(self, starts, final_ends, shortest, longest):
+        """
+        The windows function pairs every index of start with the indexes of end at a length in bounds from it.
+        Both lists of indexes are in increasing order, so the indexes of end paired with an index of start are
+        final_ends[first:last], and first and last only move forward as the index of start grows.
+
+        Input:
+            starts: the indexes where start begins, in increasing order
+            final_ends: the indexes where end stops, in increasing order
+            shortest, longest: the bounds on the length of a substring
+        Return:
+            A generator of (index of start, first, last) triples
+
+        Time complexity: 
+            Best and Worst case analysis: O(K), where K is the number of occurrences of start and end
+        Space complexity: 
+            Aux space analysis: O(1)
+        """
+        first = last = 0
         for indexes in starts:
-            for indexes2 in final_ends:
-                if not ((len(start)+len(end)) > len(self.genome[indexes:indexes2])): # and not (indexes>ends[i]):
-                    return_list.append(self.genome[indexes:indexes2])
-        # returns the strings matched by start and end
-        return return_list
+            # first is the first index in final_ends far enough from indexes
+            while first < len(final_ends) and final_ends[first] - indexes < shortest:
+                first += 1
+            # last is the first index in final_ends too far from indexes
+            if last < first:
+                last = first
+            while last < len(final_ends) and final_ends[last] - indexes <= longest:
+                last += 1
+            yield indexes, first, last
+
+    def find_iter(self, start, end, min_len=None, max_len=None):
+        """
+        The find_iter function yields every substring of genome which has start as a prefix and end as a suffix,
+        in the order of find, as a memoryview slice of the bytes of the genome which shares their memory
+        (bytes(view) or view.tobytes() copies one out). A string genome is encoded to bytes once, on first use.
+
+        Input:
+            start: The prefix of the substrings
+            end: The suffix of the substrings
+            min_len, max_len: bounds on the length of the substrings, no bound if None
+        Return:
+            A generator of memoryview objects
 
+        Time complexity: 
+            Best and Worst case analysis: O((T+U) log N + K log K + P), where P is the number of substrings
+                                          (plus O(N) to encode a string genome the first time)
+        Space complexity: 
+            Input space analysis: O(T+U), where T is the length of the start and U is the length of the end
+            Aux space analysis: O(K), the occurrences of start and end
+        """
+        if self.genome_bytes is None:
+            self.genome_bytes = self.genome.encode('ascii')
+        view = memoryview(self.genome_bytes)
+        for begin, stop in self.find_spans(start, end, min_len, max_len):
+            yield view[begin:stop]
+
+    def key(self, query):
+        """
+        The key function returns query as the same type as genome (string or bytes), encoding or decoding it
+        as ASCII if needed, so that it can be searched in self.suffix_trie
 
+        Input:
+            query: a string, bytes or memoryview to look for
+        Return:
+            query as a string if genome is a string, as bytes otherwise
+
+        Time complexity: 
+            Best and Worst case analysis: O(M), where M is the length of query
+        Space complexity: 
+            Aux space analysis: O(M), where M is the length of query
+        """
+        if isinstance(self.genome, str):
+            return query if isinstance(query, str) else bytes(query).decode('ascii')
+        return query.encode('ascii') if isinstance(query, str) else bytes(query)
@@ -0,0 +1,341 @@
+# ==========
+# Benchmark of the TreeMap in Dijkstra&MinHeap.py on reproducible synthetic forests
+# Times construction, escape() (with every engine and heap backend), and its two searches and shortest_time()
+# separately, reports peak memory, and checks every answer against a reference Dijkstra written here
+#
+# Usage: python benchmark.py [--kinds grid,power_law] [--sizes 1000,10000] [--queries 5] [--seed 1]
+
+
+import argparse
+import heapq
+import importlib.util
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+
+def load_module(path=None):
+    """
+    Loads Dijkstra&MinHeap.py with its own load_module(), which registers it in sys.modules as dijkstra_minheap.
+    Unless that module is already loaded, the file is first run once unregistered, only to reach its load_module().
+
+    Input:
+        path: path of the module, the one next to this script if None
+    Return: the module
+    """
+    if path is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Dijkstra&MinHeap.py")
+    loader = sys.modules.get("dijkstra_minheap")
+    if loader is None:
+        spec = importlib.util.spec_from_file_location("dijkstra_minheap_loader", path)
+        loader = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(loader)
+    return loader.load_module(path)
+
+
+# ---------- Forest generators ----------
+# Every generator takes the number of Trees, a random.Random and the number of solulus and exits, and returns
+# (roads, solulus, queries) where queries is a list of (start, exits) pairs
+
+def random_sparse(n, rng, solulus=10, exits=2, queries=5):
+    """
+    Roads between Trees picked uniformly at random, four per Tree on average, weights from 1 to 100
+    """
+    roads = [(rng.randrange(n), rng.randrange(n), rng.randint(1, 100)) for _ in range(4 * n)]
+    return roads, _solulus(n, rng, solulus), _queries(n, rng, exits, queries)
+
+
+def grid(n, rng, solulus=10, exits=2, queries=5):
+    """
+    Square grid of about n Trees, every Tree having a road to each of its (up to four) neighbours, weights from
+    1 to 20
+    """
+    side = max(2, math.isqrt(n))
+    n = side * side
+    roads = []
+    for y in range(side):
+        for x in range(side):
+            u = y * side + x
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                if 0 <= x + dx < side and 0 <= y + dy < side:
+                    roads.append((u, (y + dy) * side + x + dx, rng.randint(1, 20)))
+    return roads, _solulus(n, rng, solulus), _queries(n, rng, exits, queries)
+
+
+def power_law(n, rng, solulus=10, exits=2, queries=5, links=3):
+    """
+    Preferential attachment (Barabasi-Albert): every new Tree links both ways to links Trees picked in
+    proportion to their number of roads, which gives a few Trees with very many roads
+    """
+    roads = []
+    #Every Tree appears once per road end, so a uniform pick from ends favours Trees with many roads
+    ends = list(range(min(n, links + 1)))
+    for u in range(1, min(n, links + 1)):
+        roads.append((u - 1, u, rng.randint(1, 100)))
+        roads.append((u, u - 1, rng.randint(1, 100)))
+    for u in range(links + 1, n):
+        for v in set(rng.choice(ends) for _ in range(links)):
+            roads.append((u, v, rng.randint(1, 100)))
+            roads.append((v, u, rng.randint(1, 100)))
+            ends.extend((u, v))
+    return roads, _solulus(n, rng, solulus), _queries(n, rng, exits, queries)
+
+
+def many_solulu(n, rng, solulus=None, exits=2, queries=5):
+    """
+    random_sparse() with a tenth of the Trees being solulus
+    """
+    return random_sparse(n, rng, max(1, n // 10), exits, queries)
+
+
+def many_exit(n, rng, solulus=10, exits=None, queries=5):
+    """
+    random_sparse() with a twentieth of the Trees being exits of every query
+    """
+    return random_sparse(n, rng, solulus, max(1, n // 20), queries)
+
+
+def _solulus(n, rng, count):
+    """
+    count solulus on distinct Trees, with a claw_time from 0 to 10 and a random teleport target
+    """
+    return [(tree, rng.randint(0, 10), rng.randrange(n)) for tree in rng.sample(range(n), min(n, count))]
+
+
+def _queries(n, rng, exits, count):
+    """
+    count (start, exits) pairs with distinct exits
+    """
+    return [(rng.randrange(n), rng.sample(range(n), min(n, exits))) for _ in range(count)]
+
+
+GENERATORS = {
+    "random_sparse": random_sparse,
+    "grid": grid,
+    "power_law": power_law,
+    "many_solulu": many_solulu,
+    "many_exit": many_exit,
+}
+
+
+# ---------- Reference answer ----------
+
+def reference(roads, solulus, start, exits):
+    """
+    Shortest escape time by textbook Dijkstra on adjacency lists, sharing no code with the TreeMap
+    Return: the shortest time, infinity if there is no way out
+    """
+    n = 1 + max([max(u, v) for u, v, w in roads] + [max(s, t) for s, c, t in solulus] + [start] + list(exits))
+    forward, backward = [[] for _ in range(n)], [[] for _ in range(n)]
+    for u, v, w in roads:
+        forward[u].append((v, w))
+        backward[v].append((u, w))
+    from_start = _dijkstra(forward, [start])
+    to_exit = _dijkstra(backward, exits)
+    return min((from_start[s] + c + to_exit[t] for s, c, t in solulus), default=float('inf'))
+
+
+def _dijkstra(adjacency, sources):
+    """
+    Times from the nearest source to every Tree, with a heapq of (time, tree) entries
+    """
+    time = [float('inf')] * len(adjacency)
+    queue = []
+    for source in sources:
+        time[source] = 0
+        queue.append((0, source))
+    heapq.heapify(queue)
+    while len(queue) > 0:
+        t, u = heapq.heappop(queue)
+        if t > time[u]:
+            continue
+        for v, w in adjacency[u]:
+            if t + w < time[v]:
+                time[v] = t + w
+                heapq.heappush(queue, (t + w, v))
+    return time
+
+
+def check(answer, expected, roads, solulus, start, exits):
+    """
+    Checks that answer is the expected time and that its route is a real way out taking that time: a route
+    from start to a solulu, then from its teleport target to an exit
+
+    Return: True if answer is right
+    """
+    if expected == float('inf') or answer is None:
+        return expected == float('inf') and answer is None
+    total, route = answer
+    if not math.isclose(total, expected, rel_tol=1e-9, abs_tol=1e-9):
+        return False
+    if route[0] != start or route[-1] not in set(exits):
+        return False
+    weight = {}
+    for u, v, w in roads:
+        weight[(u, v)] = min(weight.get((u, v), float('inf')), w)
+    for solulu, claw_time, teleport_to in solulus:
+        for k in range(len(route)):
+            if route[k] != solulu:
+                continue
+            #The route goes on from the teleport target, which is the solulu itself if it teleports to itself
+            for rest in (route[k:] if teleport_to == solulu else None, route[k + 1:]):
+                if not rest or rest[0] != teleport_to:
+                    continue
+                steps = list(zip(route[:k], route[1:k + 1])) + list(zip(rest, rest[1:]))
+                if all(step in weight for step in steps):
+                    if math.isclose(claw_time + sum(weight[step] for step in steps), expected,
+                                    rel_tol=1e-9, abs_tol=1e-9):
+                        return True
+    return False
+
+
+# ---------- Engines ----------
+
+def engines(module, tree_map):
+    """
+    Every way of answering escape queries on tree_map, by name
+    Return: dictionary of name -> function taking a list of (start, exits) queries and returning the answers
+    """
+    found = {}
+    for heap in module.HEAPS:
+        if heap == "bucket" and tree_map.default_heap() != "bucket":
+            continue
+        found["escape/" + heap] = lambda queries, heap=heap: [tree_map.escape(s, e, heap=heap) for s, e in queries]
+    found["escape_many"] = tree_map.escape_many
+    found["escape/dynamic"] = lambda queries: [tree_map.escape(s, e, dynamic=True) for s, e in queries]
+    if hasattr(tree_map, "escape_vectorized") and module.numpy is not None:
+        found["escape_vectorized"] = lambda queries: [tree_map.escape_vectorized(s, e) for s, e in queries]
+    return found
+
+
+def prepared_engines(module, tree_map):
+    """
+    Engines that need preprocessing first: the landmarks and the contraction hierarchy
+    Return: dictionary of name -> preprocessing function, which returns (query function, what it built)
+    """
+    def landmarks():
+        tree_map.preprocess_landmarks()
+        return ((lambda queries: [tree_map.escape(s, e, landmarks=True) for s, e in queries]),
+                "%d landmarks" % len(tree_map.landmarks))
+
+    def hierarchy():
+        index = module.ContractionHierarchy(tree_map)
+        return ((lambda queries: [index.escape(s, e) for s, e in queries]),
+                "%d shortcuts, core %d" % (len(index.middle), len(index.core)))
+
+    return {"landmarks": landmarks, "contraction_hierarchy": hierarchy}
+
+
+# ---------- Benchmark ----------
+
+def measure(function, *args):
+    """
+    Runs function once
+    Return: (result, seconds taken)
+    """
+    begin = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - begin
+
+
+def peak_memory(function, *args):
+    """
+    Runs function once under tracemalloc
+    Return: peak number of bytes allocated by Python while it ran
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(module, kind, n, rng, queries, preprocess=True):
+    """
+    Benchmarks one forest
+    Return: list of rows (kind, n, roads, what, seconds, peak bytes or None, correct or None)
+    """
+    roads, solulus, batch = GENERATORS[kind](n, rng, queries=queries)
+    rows = []
+
+    tree_map, seconds = measure(module.TreeMap, roads, solulus)
+    rows.append((kind, n, len(roads), "construction", seconds, peak_memory(module.TreeMap, roads, solulus), None))
+
+    #The pieces of escape() on their own, run as escape() runs them
+    forward, backward = tree_map.acquire_space(), tree_map.acquire_space()
+    start, exits = batch[0]
+    seconds = measure(tree_map.search_to_solulus, forward, start)[1]
+    rows.append((kind, n, len(roads), "search_to_solulus", seconds, None, None))
+    arrival = tree_map.arrival_times(forward.time)
+    #escape() answers without the search from the exits when no solulu can be reached
+    if len(arrival) > 0:
+        seconds = measure(tree_map.search_from_exits, backward, exits, arrival)[1]
+        rows.append((kind, n, len(roads), "search_from_exits", seconds, None, None))
+    seconds = measure(tree_map.shortest_time, forward.time, backward.time)[1]
+    rows.append((kind, n, len(roads), "shortest_time", seconds, None, None))
+    tree_map.release_space(forward)
+    tree_map.release_space(backward)
+
+    expected = [reference(roads, solulus, s, e) for s, e in batch]
+
+    def run(name, answer_all):
+        #Every engine starts without cached or kept searches
+        tree_map.clear_cache()
+        tree_map.drop_dynamic()
+        answers, seconds = measure(answer_all, batch)
+        correct = all(check(answer, expect, roads, solulus, s, e)
+                      for answer, expect, (s, e) in zip(answers, expected, batch))
+        tree_map.clear_cache()
+        tree_map.drop_dynamic()
+        memory = peak_memory(answer_all, batch[:1])
+        rows.append((kind, n, len(roads), name, seconds / len(batch), memory, correct))
+
+    for name, answer_all in engines(module, tree_map).items():
+        run(name, answer_all)
+    if preprocess:
+        for name, prepare in prepared_engines(module, tree_map).items():
+            (answer_all, built), seconds = measure(prepare)
+            rows.append((kind, n, len(roads), "%s (build: %s)" % (name, built), seconds, None, None))
+            run(name, answer_all)
+        tree_map.drop_landmarks()
+    return rows
+
+
+def report(rows):
+    """
+    Prints rows as a table, times per query for the engines
+    """
+    print("%-14s %9s %9s  %-56s %12s %12s  %s" % ("forest", "trees", "roads", "measure", "seconds", "peak MiB", "ok"))
+    for kind, n, roads, what, seconds, memory, correct in rows:
+        print("%-14s %9d %9d  %-56s %12.6f %12s  %s" % (
+            kind, n, roads, what, seconds, "" if memory is None else "%.2f" % (memory / 2 ** 20),
+            "" if correct is None else ("yes" if correct else "WRONG")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TreeMap escape queries on synthetic forests")
+    parser.add_argument("--kinds", default=",".join(GENERATORS), help="comma separated forest generators")
+    parser.add_argument("--sizes", default="1000", help="comma separated numbers of Trees")
+    parser.add_argument("--queries", type=int, default=5, help="queries per forest")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the generators")
+    parser.add_argument("--no-preprocess", action="store_true", help="skip the landmark and hierarchy engines")
+    parser.add_argument("--module", default=None, help="path of Dijkstra&MinHeap.py")
+    args = parser.parse_args()
+
+    module = load_module(args.module)
+    rows = []
+    for kind in args.kinds.split(","):
+        for n in (int(size) for size in args.sizes.split(",")):
+            rows.extend(benchmark(module, kind, n, random.Random("%d/%s/%d" % (args.seed, kind, n)), args.queries,
+                                  not args.no_preprocess))
+    report(rows)
+    if not all(row[6] is not False for row in rows):
+        raise SystemExit("Some answers were wrong")
+
+
+if __name__ == "__main__":
+    main()
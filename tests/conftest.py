@@ -0,0 +1,31 @@
+# ==========
+# Shared fixtures of the tests: Dijkstra&MinHeap.py is loaded by path, as benchmark.py does. The tests check
+# answers with the reference Dijkstra of benchmark.py
+
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+
+@pytest.fixture(scope="session")
+def dm():
+    """
+    The Dijkstra&MinHeap module
+    """
+    return benchmark.load_module()
+
+
+@pytest.fixture
+def rng():
+    """
+    Random numbers, the same on every run
+    """
+    return random.Random(1)
+
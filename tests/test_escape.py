@@ -0,0 +1,96 @@
+# ==========
+# escape() on every engine, against the reference Dijkstra of benchmark.py, and with ids outside the forest
+
+
+import pytest
+
+import benchmark
+
+
+ENGINES = ["binary", "4-ary", "pairing", "heapq", "bucket", "many", "dynamic", "landmarks", "hierarchy", "core",
+           "contracted", "vectorized"]
+
+
+def answer(dm, tree_map, engine, start, exits):
+    """
+    escape() of tree_map on the named engine
+    """
+    if engine == "many":
+        return tree_map.escape_many([(start, exits)])[0]
+    if engine == "dynamic":
+        return tree_map.escape(start, exits, dynamic=True)
+    if engine == "landmarks":
+        tree_map.preprocess_landmarks(2)
+        return tree_map.escape(start, exits, landmarks=True)
+    if engine == "vectorized":
+        if dm.numpy is None:
+            pytest.skip("NumPy is not installed")
+        return tree_map.escape_vectorized(start, exits)
+    if engine == "hierarchy":
+        return dm.ContractionHierarchy(tree_map).escape(start, exits)
+    if engine == "core":
+        #Most Trees are left in the core
+        return dm.ContractionHierarchy(tree_map, core_degree=1).escape(start, exits)
+    if engine == "contracted":
+        return dm.ContractionHierarchy(tree_map, core_degree=None).escape(start, exits)
+    return tree_map.escape(start, exits, heap=engine)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_random_forests(dm, rng, engine):
+    for _ in range(30):
+        n = rng.randint(2, 40)
+        roads = [(rng.randrange(n), rng.randrange(n), rng.randint(0, 20)) for _ in range(rng.randint(1, 4 * n))]
+        roads.append((n - 1, n - 1, 0))
+        solulus = [(tree, rng.randint(0, 9), rng.randrange(n)) for tree in rng.sample(range(n), rng.randint(0, 4))]
+        start, exits = rng.randrange(n), rng.sample(range(n), rng.randint(1, 3))
+        tree_map = dm.TreeMap(roads, solulus)
+        expected = benchmark.reference(roads, solulus, start, exits)
+        assert benchmark.check(answer(dm, tree_map, engine, start, exits), expected, roads, solulus, start, exits)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_exit_outside_forest_is_skipped(dm, engine):
+    tree_map = dm.TreeMap([(0, 1, 1), (1, 2, 1)], [(1, 0, 2)])
+    assert answer(dm, tree_map, engine, 0, [2, 5]) == (1, [0, 1, 2])
+    assert answer(dm, dm.TreeMap([(0, 1, 1), (1, 2, 1)], [(1, 0, 2)]), engine, 0, [5]) is None
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_teleport_outside_forest_is_unreachable(dm, engine):
+    roads = [(0, 1, 1), (1, 2, 1), (0, 3, 5), (3, 2, 1)]
+    tree_map = dm.TreeMap(roads, [(1, 0, 9), (3, 0, 3)])
+    assert answer(dm, tree_map, engine, 0, [2]) == (6, [0, 3, 2])
+    assert answer(dm, dm.TreeMap(roads, [(1, 0, 9)]), engine, 0, [9]) is None
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_start_outside_forest(dm, engine):
+    tree_map = dm.TreeMap([(0, 1, 1)], [(1, 0, 1)])
+    with pytest.raises(ValueError):
+        answer(dm, tree_map, engine, 7, [1])
+
+
+def test_tree_view_reads_solulu(dm):
+    tree_map = dm.TreeMap([(0, 1, 1), (1, 2, 4)], [(1, 3, 2), (2, 0, 0)])
+    views = tree_map.adjacency_list
+    assert [view.solulu for view in views] == [False, True, True]
+    assert (views[1].claw_time, views[1].teleport_to) == (3, 2)
+    assert [(road.v, road.w) for road in views[1].roads] == [(2, 4)]
+    tree_map.set_solulu(1, 5, 0)
+    assert (tree_map.tree(1).claw_time, tree_map.tree(1).teleport_to) == (5, 0)
+
+
+def test_landmarks_are_opt_in(dm, rng):
+    roads, solulus, queries = benchmark.random_sparse(200, rng)
+    tree_map = dm.TreeMap(roads, solulus)
+    start, exits = queries[0]
+    with pytest.raises(ValueError):
+        tree_map.escape(start, exits, landmarks=True)
+    tree_map.preprocess_landmarks(4)
+    expected = benchmark.reference(roads, solulus, start, exits)
+    for heap in ("bucket", "binary", None):
+        assert benchmark.check(tree_map.escape(start, exits, heap=heap), expected, roads, solulus, start, exits)
+    assert benchmark.check(tree_map.escape(start, exits, landmarks=True), expected, roads, solulus, start, exits)
+    with pytest.raises(ValueError):
+        tree_map.escape(start, exits, heap="bucket", landmarks=True)
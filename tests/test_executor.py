@@ -0,0 +1,54 @@
+# ==========
+# EscapeExecutor: answers of the worker processes, and the shared memory block when the pool cannot start
+
+
+import multiprocessing
+import sys
+
+import pytest
+
+import benchmark
+
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                                reason="EscapeExecutor forks its workers")
+
+
+def forest(rng, n=300):
+    roads, solulus, _ = benchmark.random_sparse(n, rng)
+    return roads, solulus
+
+
+def test_answers_match_escape(dm, rng):
+    roads, solulus = forest(rng)
+    tree_map = dm.TreeMap(roads, solulus)
+    distinct = [(start, [start + 1, start + 2]) for start in range(0, 40, 3)]
+    repeated = [(rng.choice([0, 1, 2]), rng.choice([[5], [6, 7]])) for _ in range(20)]
+    with dm.EscapeExecutor(tree_map, processes=2) as executor:
+        for queries in (distinct, repeated):
+            answers = executor.map(queries)
+            assert [answer and answer[0] for answer in answers] == \
+                   [answer and answer[0] for answer in (tree_map.escape(start, exits) for start, exits in queries)]
+
+
+def test_shared_memory_freed_when_pool_fails(dm, rng, monkeypatch):
+    blocks = []
+    SharedMemory = dm.shared_memory.SharedMemory
+
+    def recording(*args, **kwargs):
+        blocks.append(SharedMemory(*args, **kwargs))
+        return blocks[-1]
+
+    monkeypatch.setattr(dm.shared_memory, "SharedMemory", recording)
+    tree_map = dm.TreeMap(*forest(rng, 50))
+    with pytest.raises(ValueError):
+        dm.EscapeExecutor(tree_map, processes=-1)
+    assert len(blocks) == 1
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=blocks[0].name)
+
+
+def test_module_is_registered(dm):
+    assert sys.modules[dm.MODULE_NAME] is dm
+    assert dm.load_module() is dm
+    assert benchmark.load_module() is dm
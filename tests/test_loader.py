@@ -0,0 +1,59 @@
+# ==========
+# TreeMap.from_edge_file: text and binary edge lists give the same TreeMap as the list of roads
+
+
+import struct
+
+import pytest
+
+import benchmark
+
+
+def same_tree_map(dm, loaded, roads, solulus, queries):
+    built = dm.TreeMap(roads, solulus)
+    for name in dm.TREEMAP_ARRAYS:
+        assert list(getattr(loaded, name)) == list(getattr(built, name)), name
+    for start, exits in queries:
+        assert loaded.escape(start, exits) == built.escape(start, exits)
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 1 << 20])
+def test_text_file(dm, rng, tmp_path, chunk_size):
+    roads, solulus, queries = benchmark.random_sparse(200, rng)
+    path = tmp_path / "roads.txt"
+    #Mixed separators, CRLF line ends and no newline after the last road
+    lines = ["{} {}\t{}".format(*road) for road in roads]
+    path.write_bytes("\r\n".join(lines).encode())
+    same_tree_map(dm, dm.TreeMap.from_edge_file(path, solulus, chunk_size=chunk_size), roads, solulus, queries)
+
+
+def test_text_file_switches_to_float_weights(dm, rng, tmp_path):
+    roads, solulus, queries = benchmark.random_sparse(100, rng)
+    roads[len(roads) // 2] = (roads[len(roads) // 2][0], roads[len(roads) // 2][1], 2.5)
+    path = tmp_path / "roads.txt"
+    path.write_text("".join("{} {} {}\n".format(*road) for road in roads))
+    loaded = dm.TreeMap.from_edge_file(path, solulus, chunk_size=50)
+    assert loaded.weights.typecode == 'd'
+    same_tree_map(dm, loaded, roads, solulus, queries)
+
+
+@pytest.mark.parametrize("typecode", ['q', 'd'])
+def test_binary_file(dm, rng, tmp_path, typecode):
+    roads, solulus, queries = benchmark.random_sparse(200, rng)
+    if typecode == 'd':
+        roads = [(u, v, w + 0.25) for u, v, w in roads]
+    path = tmp_path / "roads.bin"
+    path.write_bytes(b"".join(struct.pack("=qq" + typecode, *road) for road in roads))
+    loaded = dm.TreeMap.from_edge_file(path, solulus, binary=True, weight_typecode=typecode, chunk_size=100)
+    same_tree_map(dm, loaded, roads, solulus, queries)
+
+
+def test_malformed_files(dm, tmp_path):
+    text = tmp_path / "roads.txt"
+    text.write_text("0 1 5\n1 2\n")
+    with pytest.raises(ValueError):
+        dm.TreeMap.from_edge_file(text, [])
+    binary = tmp_path / "roads.bin"
+    binary.write_bytes(struct.pack("=qqq", 0, 1, 5)[:-3])
+    with pytest.raises(ValueError):
+        dm.TreeMap.from_edge_file(binary, [], binary=True)
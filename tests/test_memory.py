@@ -0,0 +1,59 @@
+# ==========
+# nbytes(), memory_budget() and the sizes of the Tree and Road views, counted from the roads and solulus
+# given to the TreeMap
+
+
+import sys
+import tracemalloc
+
+import benchmark
+
+
+def counts(roads, solulus):
+    """
+    Number of Trees, Roads and solulus of a forest
+    """
+    trees = 1 + max([max(u, v) for u, v, w in roads] + [max(s, t) for s, c, t in solulus])
+    return trees, len(roads), len(solulus)
+
+
+def test_nbytes_counts_trees_roads_and_solulus(dm, rng):
+    for n in (1, 50, 2000):
+        roads, solulus, queries = benchmark.random_sparse(n, rng)
+        trees, road_count, solulu_count = counts(roads, solulus)
+        tree_map = dm.TreeMap(roads, solulus)
+        assert tree_map.nbytes() == (dm.BYTES_PER_TREE * (trees + 1) + dm.BYTES_PER_ROAD * road_count
+                                     + dm.BYTES_PER_SOLULU * solulu_count)
+        assert tree_map.memory_budget(0) == tree_map.nbytes()
+        assert tree_map.memory_budget(3) == tree_map.nbytes() + 3 * dm.BYTES_PER_QUERY_TREE * trees
+
+
+def test_removed_roads_keep_their_slots(dm):
+    tree_map = dm.TreeMap([(0, 1, 1), (1, 2, 1), (0, 2, 5)], [(1, 0, 1)])
+    before = tree_map.nbytes()
+    tree_map.remove_road(0, 2)
+    assert tree_map.nbytes() == before
+    assert tree_map.memory_budget(0) == before
+    tree_map.add_road(0, 2, 4)
+    assert tree_map.nbytes() == tree_map.memory_budget(0) == before
+
+
+def test_view_sizes(dm):
+    tree, road = dm.Tree(0), dm.Road(0, 0, 0)
+    assert sys.getsizeof(tree) == dm.TREE_VIEW_BYTES
+    assert sys.getsizeof(road) == dm.ROAD_VIEW_BYTES
+    assert not hasattr(tree, "__dict__") and not hasattr(road, "__dict__")
+
+
+def test_tree_map_and_search_stay_within_budget(dm, rng):
+    roads, solulus, queries = benchmark.random_sparse(5000, rng)
+    tracemalloc.start()
+    try:
+        tree_map = dm.TreeMap(roads, solulus)
+        space = tree_map.acquire_space()
+        tree_map.escape(*queries[0])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert len(space.time) == counts(roads, solulus)[0]
+    assert peak <= tree_map.memory_budget(1)
@@ -0,0 +1,98 @@
+# ==========
+# OrfFinder and its suffix array on random A-D genomes, against a brute force suffix sort and the nested loops
+# of the suffix trie OrfFinder.find it replaced
+
+
+import pytest
+
+from OrfFinder import OrfFinder, SuffixArray, SuffixTrie
+
+
+def baseline_find(genome, start, end):
+    """
+    Substrings of genome with start as a prefix and end as a suffix, in the order of the suffix trie find:
+    every index of start in increasing order, paired with every index where end stops in decreasing order
+    """
+    if len(start) == 0 or len(end) == 0:
+        return []
+    starts = [i for i in range(len(genome)) if genome.startswith(start, i)]
+    final_ends = [i + len(end) for i in range(len(genome) - 1, -1, -1) if genome.startswith(end, i)]
+    return [genome[i:j] for i in starts for j in final_ends if len(start) + len(end) <= len(genome[i:j])]
+
+
+def random_genome(rng, letters="ABCD"):
+    return "".join(rng.choice(letters) for _ in range(rng.randint(1, 40)))
+
+
+def random_key(rng, genome):
+    #Half of the keys are taken from the genome, so that most of them occur
+    if rng.random() < 0.5:
+        i = rng.randrange(len(genome))
+        return genome[i:i + rng.randint(0, 3)]
+    return random_genome(rng)[:rng.randint(0, 3)]
+
+
+def test_suffix_array(rng):
+    for _ in range(3000):
+        genome = random_genome(rng, rng.choice(["AB", "ABCD"]))
+        n = len(genome)
+        index = SuffixArray(genome)
+        assert list(index.suffixes) == sorted(range(n), key=lambda i: genome[i:])
+        for r in range(1, n):
+            i, j = index.suffixes[r - 1], index.suffixes[r]
+            h = 0
+            while i + h < n and j + h < n and genome[i + h] == genome[j + h]:
+                h += 1
+            assert index.lcp[r] == h
+        key = random_key(rng, genome)
+        expected = [i for i in range(n) if genome.startswith(key, i)] if len(key) > 0 else []
+        assert index.search(key) == expected
+    assert SuffixTrie is SuffixArray
+
+
+def test_find_and_count(rng):
+    for _ in range(3000):
+        genome = random_genome(rng, rng.choice(["AB", "ABCD"]))
+        finder = OrfFinder(genome)
+        start, end = random_key(rng, genome), random_key(rng, genome)
+        expected = baseline_find(genome, start, end)
+        assert finder.find(start, end) == expected
+        assert finder.count(start, end) == len(expected)
+        assert [bytes(view) for view in finder.find_iter(start, end)] == [s.encode() for s in expected]
+        assert [genome[i:j] for i, j in finder.find_spans(start, end)] == expected
+
+        min_len, max_len = rng.choice([None, rng.randint(0, 20)]), rng.choice([None, rng.randint(0, 30)])
+        bounded = [s for s in expected
+                   if (min_len is None or len(s) >= min_len) and (max_len is None or len(s) <= max_len)]
+        assert finder.find(start, end, min_len, max_len) == bounded
+        assert finder.count(start, end, min_len=min_len, max_len=max_len) == len(bounded)
+
+
+def test_bytes_genome(rng):
+    for _ in range(500):
+        genome = random_genome(rng)
+        finder = OrfFinder(genome.encode())
+        start, end = random_key(rng, genome), random_key(rng, genome)
+        expected = [s.encode() for s in baseline_find(genome, start, end)]
+        for query in ((start, end), (start.encode(), end.encode()), (memoryview(start.encode()), end)):
+            assert finder.find(*query) == expected
+            assert finder.count(*query) == len(expected)
+            assert [view.tobytes() for view in finder.find_iter(*query)] == expected
+
+
+@pytest.mark.parametrize("genome", ["AAABBBCCCDDD", b"AAABBBCCCDDD"])
+def test_empty_keys(genome):
+    finder = OrfFinder(genome)
+    for start, end in (("", "B"), ("A", ""), ("", "")):
+        assert finder.find(start, end) == []
+        assert finder.count(start, end) == 0
+        assert list(finder.find_iter(start, end)) == []
+
+
+def test_examples():
+    finder = OrfFinder("AAABBBCCCDDD")
+    assert finder.find("AAB", "BCC") == ["AABBBCC"]
+    assert finder.find("BCC", "DD") == ["BCCCDDD", "BCCCDD"]
+    assert finder.find("A", "B") == ["AAABBB", "AAABB", "AAAB", "AABBB", "AABB", "AAB", "ABBB", "ABB", "AB"]
+    assert finder.find("AAA", "A") == []
+    assert finder.find("A", "B", min_len=3, max_len=4) == ["AAAB", "AABB", "AAB", "ABBB", "ABB"]
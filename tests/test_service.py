@@ -0,0 +1,132 @@
+# ==========
+# EscapeService: answers in the callers' order, backpressure, cancelled and failing callers, and close()
+
+
+import asyncio
+import threading
+
+import pytest
+
+import benchmark
+
+
+def forest(dm, rng):
+    roads, solulus, queries = benchmark.random_sparse(200, rng, queries=12)
+    return dm.TreeMap(roads, solulus), queries
+
+
+def gated(service):
+    """
+    Holds every batch of service on its thread until the returned Event is set
+    """
+    gate = threading.Event()
+    run = service.run
+
+    def waiting(queries):
+        gate.wait(10)
+        return run(queries)
+
+    service.run = waiting
+    return gate
+
+
+async def settle(condition):
+    """
+    Lets the event loop run until condition() holds
+    """
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(poll(), 10)
+
+
+def test_answers_in_order(dm, rng):
+    tree_map, queries = forest(dm, rng)
+    expected = [tree_map.escape(start, exits) for start, exits in queries]
+
+    async def main():
+        async with dm.EscapeService(tree_map, batch_size=5) as service:
+            answers = await asyncio.gather(*[service.escape(start, exits) for start, exits in queries])
+        return answers, service.batches
+
+    answers, batches = asyncio.run(main())
+    assert answers == expected
+    assert 3 <= batches < len(queries)
+
+
+def test_full_queue_holds_callers_back(dm, rng):
+    tree_map, queries = forest(dm, rng)
+
+    async def main():
+        service = dm.EscapeService(tree_map, batch_size=1, max_pending=2)
+        gate = gated(service)
+        callers = [asyncio.ensure_future(service.escape(start, exits)) for start, exits in queries[:8]]
+        #One request is being answered, two wait in the queue and the other five wait to get in
+        await settle(lambda: service.queue.full())
+        await asyncio.sleep(0.01)
+        assert service.queue.qsize() == 2
+        assert not any(caller.done() for caller in callers)
+        gate.set()
+        answers = await asyncio.gather(*callers)
+        await service.close()
+        return answers
+
+    assert asyncio.run(main()) == [tree_map.escape(start, exits) for start, exits in queries[:8]]
+
+
+def test_cancelled_caller(dm, rng):
+    tree_map, queries = forest(dm, rng)
+
+    async def main():
+        service = dm.EscapeService(tree_map, batch_size=1)
+        gate = gated(service)
+        first = asyncio.ensure_future(service.escape(*queries[0]))
+        await settle(lambda: service.queue.empty() and service.batches == 1)
+        cancelled = asyncio.ensure_future(service.escape(*queries[1]))
+        await settle(lambda: service.queue.qsize() == 1)
+        cancelled.cancel()
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        answers = [await first, await service.escape(*queries[2])]
+        await service.close()
+        return answers, service.batches
+
+    answers, batches = asyncio.run(main())
+    assert answers == [tree_map.escape(*queries[0]), tree_map.escape(*queries[2])]
+    #The cancelled request was dropped without being answered
+    assert batches == 2
+
+
+def test_failing_query_fails_only_its_caller(dm, rng):
+    tree_map, queries = forest(dm, rng)
+
+    async def main():
+        async with dm.EscapeService(tree_map, batch_window=0.05) as service:
+            return await asyncio.gather(service.escape(*queries[0]), service.escape(10 ** 9, [0]),
+                                        service.escape(*queries[1]), return_exceptions=True)
+
+    first, failed, second = asyncio.run(main())
+    assert isinstance(failed, ValueError)
+    assert [first, second] == [tree_map.escape(*queries[0]), tree_map.escape(*queries[1])]
+
+
+def test_close_answers_queued_requests(dm, rng):
+    tree_map, queries = forest(dm, rng)
+
+    async def main():
+        service = dm.EscapeService(tree_map, batch_size=1)
+        gate = gated(service)
+        callers = [asyncio.ensure_future(service.escape(start, exits)) for start, exits in queries[:5]]
+        await settle(lambda: service.queue.qsize() == 4)
+        closing = asyncio.ensure_future(service.close())
+        await asyncio.sleep(0.01)
+        assert not closing.done()
+        gate.set()
+        await closing
+        assert all(caller.done() for caller in callers)
+        with pytest.raises(RuntimeError):
+            await service.escape(*queries[0])
+        return [caller.result() for caller in callers]
+
+    assert asyncio.run(main()) == [tree_map.escape(start, exits) for start, exits in queries[:5]]
@@ -0,0 +1,123 @@
+# ==========
+# TreeMap.save/open: round trips, corrupt snapshots and the temporary file of save()
+
+
+import os
+import threading
+
+import pytest
+
+import benchmark
+
+
+def forest(rng, n=300, floats=False):
+    roads, solulus, queries = benchmark.random_sparse(n, rng)
+    if floats:
+        roads = [(u, v, w + 0.5) for u, v, w in roads]
+    return roads, solulus, queries
+
+
+@pytest.mark.parametrize("floats", [False, True])
+def test_round_trip(dm, rng, tmp_path, floats):
+    roads, solulus, queries = forest(rng, floats=floats)
+    tree_map = dm.TreeMap(roads, solulus)
+    path = tmp_path / "forest.snapshot"
+    tree_map.save(path)
+    assert os.listdir(tmp_path) == ["forest.snapshot"]
+
+    opened = dm.TreeMap.open(path)
+    for name in dm.TREEMAP_ARRAYS:
+        assert list(getattr(opened, name)) == list(getattr(tree_map, name)), name
+    assert opened.max_weight == tree_map.max_weight
+    for start, exits in queries:
+        assert opened.escape(start, exits) == tree_map.escape(start, exits)
+
+    #Changing an opened TreeMap copies its arrays out of the mapping
+    opened.add_road(queries[0][0], queries[0][1][0], 0)
+    tree_map.add_road(queries[0][0], queries[0][1][0], 0)
+    assert opened.escape(*queries[0]) == tree_map.escape(*queries[0])
+
+
+def test_cut_or_padded_snapshot_is_rejected(dm, rng, tmp_path):
+    path = tmp_path / "forest.snapshot"
+    dm.TreeMap(*forest(rng)[:2]).save(path)
+    data = path.read_bytes()
+    for corrupt in (data[:-800], data[:-8], data + b"\0" * 8, data[:20], b""):
+        path.write_bytes(corrupt)
+        with pytest.raises(ValueError):
+            dm.TreeMap.open(path)
+
+
+def test_bad_typecode_is_rejected(dm, rng, tmp_path):
+    path = tmp_path / "forest.snapshot"
+    dm.TreeMap(*forest(rng)[:2]).save(path)
+    data = bytearray(path.read_bytes())
+    table = dm._SNAPSHOT_HEADER.size
+    for position in (table, 13):
+        corrupt = bytearray(data)
+        corrupt[position:position + 1] = b"x"
+        path.write_bytes(bytes(corrupt))
+        with pytest.raises(ValueError):
+            dm.TreeMap.open(path)
+
+
+def test_failed_save_leaves_no_temporary_file(dm, rng, tmp_path, monkeypatch):
+    path = tmp_path / "forest.snapshot"
+    tree_map = dm.TreeMap(*forest(rng)[:2])
+    tree_map.save(path)
+    before = path.read_bytes()
+
+    def failing(source, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(dm.os, "replace", failing)
+    with pytest.raises(OSError):
+        dm.TreeMap(*forest(rng)[:2]).save(path)
+    assert os.listdir(tmp_path) == ["forest.snapshot"]
+    assert path.read_bytes() == before
+
+
+def test_concurrent_saves(dm, rng, tmp_path):
+    path = tmp_path / "forest.snapshot"
+    tree_maps = [dm.TreeMap(*forest(rng, n)[:2]) for n in (200, 400)]
+    threads = [threading.Thread(target=lambda tree_map=tree_map: [tree_map.save(path) for _ in range(20)])
+               for tree_map in tree_maps]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert os.listdir(tmp_path) == ["forest.snapshot"]
+    opened = dm.TreeMap.open(path)
+    assert any(list(opened.targets) == list(tree_map.targets) for tree_map in tree_maps)
+
+
+def test_free_slots_are_not_saved(dm, tmp_path):
+    path = tmp_path / "forest.snapshot"
+    tree_map = dm.TreeMap([(0, 1, 1), (1, 2, 1), (0, 2, 5)], [(1, 0, 1)])
+    tree_map.remove_road(0, 2)
+    tree_map.add_road(2, 0, 3)
+    tree_map.save(path)
+
+    opened = dm.TreeMap.open(path)
+    for id in range(3):
+        assert ([(road.v, road.w) for road in opened.tree(id).roads]
+                == [(road.v, road.w) for road in tree_map.tree(id).roads])
+    assert list(opened.targets) == [1, 2, 0]
+    assert list(opened.reverse_targets) == [2, 0, 1]
+    with pytest.raises(ValueError):
+        opened.remove_road(0, 0)
+    assert opened.escape(2, [1]) == tree_map.escape(2, [1]) == (4, [2, 0, 1])
+
+
+@pytest.mark.skipif(not hasattr(os, "fchmod"), reason="file modes are POSIX only")
+def test_snapshot_mode_follows_umask(dm, rng, tmp_path):
+    tree_map = dm.TreeMap(*forest(rng)[:2])
+    umask = os.umask(0o022)
+    try:
+        tree_map.save(tmp_path / "shared.snapshot")
+        os.umask(0o077)
+        tree_map.save(tmp_path / "private.snapshot")
+    finally:
+        os.umask(umask)
+    assert os.stat(tmp_path / "shared.snapshot").st_mode & 0o777 == 0o644
+    assert os.stat(tmp_path / "private.snapshot").st_mode & 0o777 == 0o600
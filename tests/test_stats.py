@@ -0,0 +1,82 @@
+# ==========
+# Instrumented escape(): EscapeStats, the CountingHeap counters and the on_escape callback
+
+
+import pytest
+
+import benchmark
+
+
+HEAPS = ["binary", "4-ary", "pairing", "heapq", "bucket"]
+PHASES = {"forward", "arrival", "backward", "combine", "total"}
+
+
+def discovered(tree_map, start, exits, heap):
+    """
+    Trees discovered and finalized by the two searches of escape(), run by hand, and the phases timed
+    """
+    forward, backward = tree_map.acquire_space(heap), tree_map.acquire_space(heap)
+    try:
+        tree_map.search_to_solulus(forward, start)
+        arrival = tree_map.arrival_times(forward.time)
+        if len(arrival) > 0:
+            tree_map.search_from_exits(backward, exits, arrival)
+        spaces = (forward, backward)
+        return (sum(len(space.touched) for space in spaces),
+                sum(space.visited[tree] for space in spaces for tree in space.touched),
+                PHASES if len(arrival) > 0 else {"forward", "arrival", "total"})
+    finally:
+        tree_map.release_space(forward)
+        tree_map.release_space(backward)
+
+
+@pytest.mark.parametrize("heap", HEAPS)
+def test_counters(dm, rng, heap):
+    roads, solulus, queries = benchmark.random_sparse(300, rng, queries=8)
+    tree_map = dm.TreeMap(roads, solulus)
+    for start, exits in queries:
+        stats = dm.EscapeStats()
+        assert tree_map.escape(start, exits, heap=heap, stats=stats) == tree_map.escape(start, exits, heap=heap)
+        trees, settled, phases = discovered(tree_map, start, exits, heap)
+        assert stats.inserts == trees
+        assert stats.settled == settled <= stats.serves <= stats.inserts
+        assert stats.relaxed >= 0 and stats.updates >= 0
+        if heap != "binary":
+            assert stats.rises == stats.sinks == 0
+        assert set(stats.times) == phases
+        assert all(seconds >= 0 for seconds in stats.times.values())
+        assert stats.as_dict()["inserts"] == trees and "total_time" in stats.as_dict()
+
+
+def test_stats_add_up(dm, rng):
+    roads, solulus, queries = benchmark.random_sparse(300, rng)
+    tree_map = dm.TreeMap(roads, solulus)
+    total = dm.EscapeStats()
+    inserts = 0
+    for start, exits in queries:
+        one = dm.EscapeStats()
+        tree_map.escape(start, exits, heap="binary", stats=one)
+        tree_map.escape(start, exits, heap="binary", stats=total)
+        inserts += one.inserts
+    assert total.inserts == inserts
+    assert total.rises > 0 and total.sinks > 0
+
+
+def test_on_escape(dm, rng):
+    roads, solulus, queries = benchmark.random_sparse(300, rng)
+    tree_map = dm.TreeMap(roads, solulus)
+    calls = []
+    tree_map.on_escape = calls.append
+    try:
+        answers = [tree_map.escape(start, exits) for start, exits in queries]
+        tree_map.escape(*queries[0], dynamic=True)
+        tree_map.preprocess_landmarks(2)
+        tree_map.escape(*queries[0], landmarks=True)
+    finally:
+        del tree_map.on_escape
+    assert len(calls) == len(queries) + 2
+    assert all(isinstance(stats, dm.EscapeStats) for stats in calls)
+    #Other engines are only timed as a whole
+    assert set(calls[-1].times) == set(calls[-2].times) == {"total"}
+    assert answers == [tree_map.escape(start, exits) for start, exits in queries]
+    assert dm.TreeMap.on_escape is None
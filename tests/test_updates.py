@@ -0,0 +1,114 @@
+# ==========
+# add_road(), remove_road(), set_weight() and set_solulu(): the repaired dynamic search, the cached searches
+# and the landmarks of a changed TreeMap, against the reference Dijkstra of benchmark.py
+
+
+import pytest
+
+import benchmark
+
+
+def change(tree_map, roads, solulus, rng, n):
+    """
+    Applies one random change to tree_map and to its lists of roads and solulus
+    Return: the number of Trees afterwards
+    """
+    kind = rng.choice(["add", "add", "remove", "shorter", "longer", "solulu", "grow"])
+    if kind in ("remove", "shorter", "longer") and len(roads) > 0:
+        u, v, w = rng.choice(roads)
+        if kind == "remove":
+            roads[:] = [road for road in roads if road[:2] != (u, v)]
+            tree_map.remove_road(u, v)
+        else:
+            w = max(0, w - rng.choice([1, 5, 0.5])) if kind == "shorter" else w + rng.choice([1, 7, 2.5])
+            roads[:] = [(a, b, w if (a, b) == (u, v) else c) for a, b, c in roads]
+            tree_map.set_weight(u, v, w)
+    elif kind == "solulu":
+        id, claw_time, teleport_to = rng.randrange(n), rng.randint(0, 9), rng.randrange(n)
+        solulus[:] = [solulu for solulu in solulus if solulu[0] != id] + [(id, claw_time, teleport_to)]
+        tree_map.set_solulu(id, claw_time, teleport_to)
+    else:
+        if kind == "grow":
+            n += 1
+        road = (rng.randrange(n), n - 1 if kind == "grow" else rng.randrange(n), rng.randint(0, 20))
+        roads.append(road)
+        tree_map.add_road(*road)
+    return n
+
+
+@pytest.mark.parametrize("engine", ["dynamic", "cached", "landmarks"])
+def test_random_changes(dm, rng, engine):
+    for _ in range(10):
+        n = rng.randint(2, 25)
+        roads = [(rng.randrange(n), rng.randrange(n), rng.randint(0, 20)) for _ in range(2 * n)]
+        roads.append((n - 1, n - 1, 0))
+        solulus = [(tree, rng.randint(0, 9), rng.randrange(n)) for tree in rng.sample(range(n), 2)]
+        start, exits = rng.randrange(n), rng.sample(range(n), 2)
+        tree_map = dm.TreeMap(roads, solulus)
+        for _ in range(25):
+            n = change(tree_map, roads, solulus, rng, n)
+            if engine == "landmarks":
+                tree_map.preprocess_landmarks(2)
+            if engine == "cached":
+                #The second call is answered from the cache, which the change must have emptied
+                answer = tree_map.escape_many([(start, exits)])[0]
+                assert tree_map.escape_many([(start, exits)])[0] == answer
+            else:
+                answer = tree_map.escape(start, exits, dynamic=engine == "dynamic", landmarks=engine == "landmarks")
+            expected = benchmark.reference(roads, solulus, start, exits)
+            assert benchmark.check(answer, expected, roads, solulus, start, exits)
+            fresh = dm.TreeMap(roads, solulus).escape(start, exits)
+            assert (fresh is None) == (answer is None)
+            assert fresh is None or fresh[0] == pytest.approx(answer[0])
+
+
+def test_dynamic_search_is_repaired_not_redone(dm):
+    tree_map = dm.TreeMap([(0, 1, 5), (1, 2, 5), (0, 3, 1), (3, 1, 1)], [(1, 0, 1)])
+    assert tree_map.escape(0, [2], dynamic=True) == (7, [0, 3, 1, 2])
+    kept = tree_map._dynamic
+    tree_map.set_weight(3, 1, 9)
+    tree_map.remove_road(1, 2)
+    tree_map.add_road(1, 2, 1)
+    assert tree_map._dynamic is kept
+    assert tree_map.escape(0, [2], dynamic=True) == (6, [0, 1, 2])
+
+
+def test_failed_cached_search_returns_its_space(dm):
+    tree_map = dm.TreeMap([(0, 1, 1), (1, 2, 1)], [(1, 0, 2)])
+    tree_map.escape(0, [2])
+    assert sum(len(pool) for pool in tree_map._spaces.values()) == 2
+    with pytest.raises(ValueError):
+        tree_map.escape_many([(0, [2]), (99, [2])])
+    #The two searches of the first query are cached, the failed one is back in the pool
+    assert len(tree_map._cache) == 2
+    assert sum(len(pool) for pool in tree_map._spaces.values()) == 1
+
+
+def test_missing_road(dm):
+    tree_map = dm.TreeMap([(0, 1, 1), (1, 2, 1)], [(1, 0, 2)])
+    for u, v in ((1, 0), (0, 2), (0, 9), (-1, 0)):
+        with pytest.raises(ValueError):
+            tree_map.remove_road(u, v)
+        with pytest.raises(ValueError):
+            tree_map.set_weight(u, v, 3)
+    tree_map.remove_road(0, 1)
+    with pytest.raises(ValueError):
+        tree_map.remove_road(0, 1)
+    assert tree_map.escape(0, [2]) is None
+
+
+def test_hierarchy_of_changed_tree_map(dm):
+    tree_map = dm.TreeMap([(0, 1, 10), (1, 2, 10), (0, 2, 30)], [(0, 0, 0)])
+    hierarchy = dm.ContractionHierarchy(tree_map)
+    assert hierarchy.escape(0, [2]) == (20, [0, 1, 2])
+    tree_map.set_weight(0, 2, 1)
+    with pytest.raises(RuntimeError):
+        hierarchy.escape(0, [2])
+    assert dm.ContractionHierarchy(tree_map).escape(0, [2]) == tree_map.escape(0, [2]) == (1, [0, 2])
+
+    hierarchy = dm.ContractionHierarchy(tree_map)
+    tree_map.set_solulu(1, 0, 1)
+    with pytest.raises(RuntimeError):
+        hierarchy.escape(0, [2])
+    tree_map.add_road(3, 0, 1)
+    assert dm.ContractionHierarchy(tree_map).escape(3, [2]) == tree_map.escape(3, [2]) == (2, [3, 0, 2])